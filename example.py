@@ -4,14 +4,15 @@
 """
 
 import sys
-sys.path.append('src')
+import os
+import numpy as np
 
-from data.data_loader import get_stock_data
-from indicators.ma_system import calculate_ma_system
-from indicators.bollinger import analyze_bollinger_bands
-from indicators.kdj_rsi import analyze_kdj_rsi
-from visualization.kline_chart import plot_kline_chart
-from analysis.statistics import generate_comprehensive_analysis
+# 添加src目录到Python路径（使用绝对路径，与各模块的路径检查一致，避免重复添加）
+_src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+if _src_dir not in sys.path:
+    sys.path.append(_src_dir)
+
+# 各功能模块在用到时再导入，只运行部分示例时无需加载全部依赖
 
 
 def example_basic_usage():
@@ -21,6 +22,7 @@ def example_basic_usage():
     # 1. 获取股票数据
     print("1. 获取股票数据...")
     try:
+        from data.data_loader import get_stock_data
         df = get_stock_data("600000.SH", "20240101", "20241201")
         print(f"   成功获取数据: {len(df)} 条记录")
         print(f"   时间范围: {df.index[0].date()} 至 {df.index[-1].date()}")
@@ -31,6 +33,7 @@ def example_basic_usage():
     # 2. 计算移动平均线系统
     print("\n2. 计算移动平均线系统...")
     try:
+        from indicators.ma_system import calculate_ma_system
         ma_system, ma_stats = calculate_ma_system(df)
         print(f"   计算了 {len(ma_system.ma_data)} 条移动平均线")
         print("   交叉频率统计:")
@@ -41,6 +44,7 @@ def example_basic_usage():
     # 3. 布林带分析
     print("\n3. 布林带指标分析...")
     try:
+        from indicators.bollinger import analyze_bollinger_bands
         bollinger, breakout, squeeze = analyze_bollinger_bands(df)
         print(f"   上轨突破: {breakout['upper_count']} 次")
         print(f"   下轨突破: {breakout['lower_count']} 次")
@@ -51,6 +55,7 @@ def example_basic_usage():
     # 4. KDJ和RSI分析
     print("\n4. KDJ与RSI指标分析...")
     try:
+        from indicators.kdj_rsi import analyze_kdj_rsi
         comparator, kdj_analysis, returns, comparison = analyze_kdj_rsi(df)
         print(f"   120天内KDJ超买: {kdj_analysis['overbought_count']} 次")
         print(f"   120天内KDJ超卖: {kdj_analysis['oversold_count']} 次")
@@ -61,6 +66,7 @@ def example_basic_usage():
     # 5. 绘制基础K线图
     print("\n5. 绘制K线图...")
     try:
+        from visualization.kline_chart import plot_kline_chart
         fig, axes = plot_kline_chart(df, 'basic', title="基础K线图示例")
         print("   K线图绘制成功")
         # plt.show()  # 注释掉以避免阻塞
@@ -70,6 +76,7 @@ def example_basic_usage():
     # 6. 生成统计报告
     print("\n6. 生成分析报告...")
     try:
+        from analysis.statistics import generate_comprehensive_analysis
         stats, report, report_path = generate_comprehensive_analysis(df)
         print(f"   报告生成成功: {report_path}")
         print(f"   总收益率: {report['basic_stats']['returns_stats']['total_return']:+.2f}%")
@@ -86,6 +93,8 @@ def example_advanced_usage():
     
     # 获取数据
     try:
+        from data.data_loader import get_stock_data
+        
         df = get_stock_data()
         
         # 自定义技术指标组合分析
@@ -104,8 +113,15 @@ def example_advanced_usage():
         ma_signals = ma_system.identify_ma_cross_signals()
         macd_signals = macd.identify_macd_signals()
         
+        # 汇总所有均线组合的交叉次数
+        golden_counts = np.fromiter((signals['golden_count'] for signals in ma_signals.values()),
+                                    dtype=np.int64, count=len(ma_signals))
+        death_counts = np.fromiter((signals['death_count'] for signals in ma_signals.values()),
+                                   dtype=np.int64, count=len(ma_signals))
+        
         print("自定义信号统计:")
-        print(f"  MA金叉信号: {sum(signals['golden_count'] for signals in ma_signals.values())}")
+        print(f"  MA金叉信号: {golden_counts.sum()}")
+        print(f"  MA死叉信号: {death_counts.sum()}")
         print(f"  MACD金叉信号: {macd_signals['golden_count']}")
         
         # 趋势一致性分析
@@ -13,23 +13,17 @@
 
 import sys
 import os
-import matplotlib.pyplot as plt
-import pandas as pd
+import argparse
 import warnings
+import numpy as np
 
-# 添加src目录到Python路径
-sys.path.append('src')
+# 添加src目录到Python路径（使用绝对路径，与各模块的路径检查一致，避免重复添加）
+_src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+if _src_dir not in sys.path:
+    sys.path.append(_src_dir)
 
-from data.data_loader import StockDataLoader, get_stock_data
-from indicators.ma_system import MovingAverageSystem, calculate_ma_system
-from indicators.bollinger import BollingerBands, analyze_bollinger_bands
-from indicators.kdj_rsi import KDJRSIComparator, analyze_kdj_rsi
-from indicators.macd import MACDIndicator, analyze_macd
-from visualization.kline_chart import KLineChartRenderer, plot_kline_chart
-from visualization.multi_timeframe import MultiTimeFrameAnalyzer, analyze_multi_timeframe
-from analysis.statistics import QuantitativeStatistics, generate_comprehensive_analysis
+# 数据获取、指标计算、绘图和统计模块较重（辅助函数模块会导入pandas），在各方法内按需导入
 from utils.config import DEFAULT_STOCK_CODE, DEFAULT_START_DATE, DEFAULT_END_DATE, PATHS
-from utils.helpers import ensure_directory_exists
 
 # 忽略警告
 warnings.filterwarnings('ignore')
@@ -38,7 +32,8 @@ warnings.filterwarnings('ignore')
 class FinancialAnalysisApplication:
     """金融分析应用主类"""
     
-    def __init__(self, stock_code=DEFAULT_STOCK_CODE, start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE):
+    def __init__(self, stock_code=DEFAULT_STOCK_CODE, start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE,
+                 show_charts=False, draft_charts=False):
         """
         初始化应用
         
@@ -46,10 +41,16 @@ class FinancialAnalysisApplication:
         stock_code: str - 股票代码
         start_date: str - 开始日期
         end_date: str - 结束日期
+        show_charts: bool - 是否弹出窗口显示图表，默认只保存PNG文件
+        draft_charts: bool - 是否以草稿模式（低分辨率、不裁剪边距）快速保存图表
         """
+        from utils.helpers import ensure_directory_exists
+        
         self.stock_code = stock_code
         self.start_date = start_date
         self.end_date = end_date
+        self.show_charts = show_charts
+        self.draft_charts = draft_charts
         
         # 确保输出目录存在
         ensure_directory_exists(PATHS['charts'])
@@ -67,16 +68,24 @@ class FinancialAnalysisApplication:
         self.stock_data = None
         self.indicators_data = {}
         self.signals_data = {}
+        self.ohlcv = None       # OHLCV的float64数组视图，供指标内核直接使用
+        self.indicators = None  # 一次性计算好的各指标对象
+        self.renderer = None    # 各任务共用的K线图渲染器
         
     def load_data(self):
         """加载股票数据"""
         print("📊 正在获取股票数据...")
         
         try:
+            from data.data_loader import StockDataLoader
+            from utils.helpers import to_ohlcv_arrays
+            
             self.data_loader = StockDataLoader()
             self.stock_data = self.data_loader.get_daily_data(
                 self.stock_code, self.start_date, self.end_date
             )
+            self.ohlcv = to_ohlcv_arrays(self.stock_data)
+            self.indicators = None
             
             print(f"✅ 数据加载成功！共获取 {len(self.stock_data)} 条记录")
             print(f"   日期范围: {self.stock_data.index[0].date()} 至 {self.stock_data.index[-1].date()}")
@@ -88,6 +97,39 @@ class FinancialAnalysisApplication:
             print(f"❌ 数据加载失败: {str(e)}")
             return False
     
+    def _get_indicators(self):
+        """获取共享的指标对象，首次调用时一次性计算全部指标"""
+        from indicators.pipeline import build_indicators
+        from utils.helpers import to_ohlcv_arrays
+        
+        if self.ohlcv is None:
+            self.ohlcv = to_ohlcv_arrays(self.stock_data)
+        if self.indicators is None:
+            self.indicators = build_indicators(self.stock_data, ohlcv=self.ohlcv)
+        return self.indicators
+    
+    def _get_renderer(self):
+        """获取共享的K线图渲染器，首次调用时创建（样式只构建一次）"""
+        if self.renderer is None:
+            from visualization.kline_chart import KLineChartRenderer
+            self.renderer = KLineChartRenderer(draft=self.draft_charts)
+        return self.renderer
+    
+    def _display_figure(self, fig):
+        """
+        显示图表或直接关闭
+        
+        Parameters:
+        fig: Figure - 已保存到文件的图表对象
+        """
+        import matplotlib.pyplot as plt
+        
+        if self.show_charts:
+            plt.show()
+        else:
+            # 图表已保存为PNG，关闭以释放内存
+            plt.close(fig)
+    
     def task1_moving_average_system(self):
         """
         任务1: 移动平均线系统构建
@@ -100,11 +142,9 @@ class FinancialAnalysisApplication:
         print("📈 任务1: 移动平均线系统构建")
         print("=" * 60)
         
-        # 创建移动平均线系统
-        ma_system = MovingAverageSystem(self.stock_data)
-        
-        # 计算所有移动平均线
-        ma_data = ma_system.calculate_all_ma()
+        # 获取移动平均线系统（均线已在指标流水线中算好）
+        ma_system = self._get_indicators()['ma']
+        ma_data = ma_system.ma_data
         print(f"✅ 计算移动平均线: {list(ma_data.keys())}")
         
         # 识别金叉死叉信号
@@ -126,13 +166,13 @@ class FinancialAnalysisApplication:
         self.data = self.stock_data.copy()  # 保存一份数据副本用于后续使用
         
         # 绘制图表
-        renderer = KLineChartRenderer()
+        renderer = self._get_renderer()
         fig, axes = renderer.plot_kline_with_ma(
             self.stock_data, ma_data, 
             f"{self.stock_code} - 任务1：K线图+移动平均线系统",
             save_path=os.path.join(PATHS['charts'], 'task1_ma_system.png')
         )
-        plt.show()
+        self._display_figure(fig)
         
         return ma_system, stats_df
     
@@ -148,19 +188,17 @@ class FinancialAnalysisApplication:
         print("📊 任务2: 布林带指标分析")
         print("=" * 60)
         
-        # 创建布林带分析
-        bollinger = BollingerBands(self.stock_data)
-        
-        # 计算布林带
-        bb_data = bollinger.calculate_bollinger_bands()
+        # 获取布林带分析（三轨已在指标流水线中算好）
+        bollinger = self._get_indicators()['bollinger']
+        bb_data = bollinger.bollinger_data
         print("✅ 计算布林带三轨: 上轨、中轨、下轨")
         
         # 计算带宽
         band_width = bollinger.calculate_band_width()
         print(f"✅ 计算布林带宽度，当前值: {band_width.iloc[-1]:.4f}")
         
-        # 识别突破信号
-        breakout_signals = bollinger.identify_breakout_signals()
+        # 识别突破信号（这里只用到突破次数，不生成完整信号序列）
+        breakout_signals = bollinger.identify_breakout_signals(include_series=False)
         print(f"✅ 突破信号统计:")
         print(f"   上轨突破次数: {breakout_signals['upper_count']}")
         print(f"   下轨突破次数: {breakout_signals['lower_count']}")
@@ -187,22 +225,23 @@ class FinancialAnalysisApplication:
         
         # 绘制图表（Task2-1: 布林带和突破信号）
         print("绘制布林带图表...")
-        renderer = KLineChartRenderer()
+        renderer = self._get_renderer()
         fig, axes = renderer.plot_kline_with_bollinger(
             self.stock_data, bb_data,
             f"{self.stock_code} - 任务2.1：K线图+布林带指标",
             save_path=os.path.join(PATHS['charts'], 'task2_1_bollinger_bands.png')
         )
-        plt.show()
+        self._display_figure(fig)
         
         # 绘制图表（Task2-2: 布林带宽度变化）
         print("绘制布林带宽度变化图...")
         fig2, ax2 = renderer.plot_bollinger_bandwidth(
             self.stock_data, self.data['BB_Width'] if 'BB_Width' in self.data.columns else bollinger.data['BB_Width'],
             f"{self.stock_code} - 任务2.2：布林带宽度变化分析",
-            save_path=os.path.join(PATHS['charts'], 'task2_2_bollinger_bandwidth.png')
+            save_path=os.path.join(PATHS['charts'], 'task2_2_bollinger_bandwidth.png'),
+            width_stats=bollinger.get_width_statistics(20)
         )
-        plt.show()
+        self._display_figure(fig2)
         
         return bollinger, breakout_signals, squeeze_analysis
     
@@ -218,16 +257,16 @@ class FinancialAnalysisApplication:
         print("🎨 任务3: 自定义K线图样式")
         print("=" * 60)
         
-        # 计算MACD指标
-        macd_indicator = MACDIndicator(self.stock_data)
-        macd_data = macd_indicator.calculate_macd()
+        # 获取MACD指标
+        macd_indicator = self._get_indicators()['macd']
+        macd_data = macd_indicator.macd_data
         print("✅ 计算MACD指标用于副图显示")
         
         # 保存MACD数据
         self.indicators_data['macd_data'] = macd_data
         
         # 创建自定义样式K线图（Task3-1: K线+MACD+成交量）
-        renderer = KLineChartRenderer()
+        renderer = self._get_renderer()
         print("✅ 应用自定义样式:")
         print("   - 上涨K线: 红色实心")
         print("   - 下跌K线: 绿色空心") 
@@ -241,7 +280,7 @@ class FinancialAnalysisApplication:
             f"{self.stock_code} - 任务3.1：自定义K线图样式 (MACD+成交量)",
             save_path=os.path.join(PATHS['charts'], 'task3_1_kline_macd_volume.png')
         )
-        plt.show()
+        self._display_figure(fig)
         
         return macd_indicator
     
@@ -257,8 +296,10 @@ class FinancialAnalysisApplication:
         print("📈 任务4: 多时间周期图表")
         print("=" * 60)
         
+        from visualization.multi_timeframe import MultiTimeFrameAnalyzer
+        
         # 创建多时间周期分析器
-        analyzer = MultiTimeFrameAnalyzer()
+        analyzer = MultiTimeFrameAnalyzer(draft=self.draft_charts)
         
         # 准备多时间周期数据
         timeframe_data = analyzer.prepare_multi_timeframe_data(self.stock_data)
@@ -293,7 +334,7 @@ class FinancialAnalysisApplication:
         timeframe_names = {'daily': '日线', 'weekly': '周线', 'monthly': '月线'}
         for timeframe, (fig, axes) in charts.items():
             print(f"  显示{timeframe_names[timeframe]}图表...")
-            plt.show()
+            self._display_figure(fig)
         
         # 绘制趋势对比表（Task4-2）
         print("绘制趋势对比表...")
@@ -302,7 +343,7 @@ class FinancialAnalysisApplication:
             f"{self.stock_code} - 多时间周期趋势对比",
             save_path=os.path.join(PATHS['charts'], 'task4_2_trend_comparison_table.png')
         )
-        plt.show()
+        self._display_figure(fig2)
         
         return analyzer, timeframe_data, trend_analysis
     
@@ -316,11 +357,9 @@ class FinancialAnalysisApplication:
         print("📊 任务5: KDJ与RSI指标比较")
         print("=" * 60)
         
-        # 创建KDJ和RSI比较器
-        comparator = KDJRSIComparator(self.stock_data)
-        
-        # 计算所有指标
-        data_with_indicators = comparator.calculate_all_indicators()
+        # 获取KDJ和RSI比较器（指标已在指标流水线中算好）
+        comparator = self._get_indicators()['kdj_rsi']
+        data_with_indicators = comparator.data
         print("✅ 计算KDJ指标 (9,3,3)")
         print("✅ 计算RSI指标 (14)")
         
@@ -340,7 +379,7 @@ class FinancialAnalysisApplication:
         self.signals_data['kdj_rsi_comparison'] = signal_comparison
         
         # 绘制分离的图表
-        renderer = KLineChartRenderer()
+        renderer = self._get_renderer()
         
         # Task5-1: KDJ指标图
         print("绘制KDJ指标图...")
@@ -349,7 +388,7 @@ class FinancialAnalysisApplication:
             f"{self.stock_code} - KDJ指标分析",
             save_path=os.path.join(PATHS['charts'], 'task5_kdj_chart.png')
         )
-        plt.show()
+        self._display_figure(fig1)
         
         # Task5-2: RSI指标图
         print("绘制RSI指标图...")
@@ -358,7 +397,7 @@ class FinancialAnalysisApplication:
             f"{self.stock_code} - RSI指标分析",
             save_path=os.path.join(PATHS['charts'], 'task5_rsi_chart.png')
         )
-        plt.show()
+        self._display_figure(fig2)
         
         return comparator, signal_comparison
     
@@ -374,16 +413,8 @@ class FinancialAnalysisApplication:
         print("📊 任务6: KDJ超买超卖统计")
         print("=" * 60)
         
-        # 使用已计算的KDJ数据或重新创建
-        if 'kdj_data' not in self.indicators_data:
-            from indicators.kdj_rsi import KDJIndicator
-            kdj = KDJIndicator(self.stock_data)
-            kdj.calculate_kdj()
-        else:
-            # 重新创建以确保有完整的方法
-            from indicators.kdj_rsi import KDJIndicator
-            kdj = KDJIndicator(self.stock_data)
-            kdj.calculate_kdj()
+        # 复用指标流水线中已计算的KDJ
+        kdj = self._get_indicators()['kdj_rsi'].kdj
         
         # 120个交易日分析
         analysis_days = 120
@@ -414,10 +445,11 @@ class FinancialAnalysisApplication:
         # KDJ有效性分析思考
         print(f"\n🤔 思考分析: KDJ在震荡市vs趋势市的有效性")
         
-        # 计算市场波动性来判断是震荡市还是趋势市
-        recent_data = self.stock_data.tail(60)  # 最近60天
-        price_volatility = recent_data['Close'].pct_change().std()
-        price_trend = (recent_data['Close'].iloc[-1] / recent_data['Close'].iloc[0] - 1) * 100
+        # 计算市场波动性来判断是震荡市还是趋势市（最近60天，直接在数组上计算）
+        recent_close = self.stock_data['Close'].to_numpy(dtype=np.float64)[-60:]
+        recent_returns = np.diff(recent_close) / recent_close[:-1]
+        price_volatility = recent_returns.std(ddof=1)
+        price_trend = (recent_close[-1] / recent_close[0] - 1) * 100
         
         if abs(price_trend) < 10 and price_volatility > 0.02:
             market_type = "震荡市"
@@ -444,6 +476,8 @@ class FinancialAnalysisApplication:
         print("📋 生成综合分析报告")
         print("=" * 60)
         
+        from analysis.statistics import QuantitativeStatistics
+        
         # 创建统计分析
         statistics = QuantitativeStatistics(self.stock_data)
         
@@ -537,8 +571,18 @@ class FinancialAnalysisApplication:
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="金融数据分析与智能量化交易应用 - 第六章作业")
+    parser.add_argument('--show', action='store_true', help="弹出窗口显示图表（默认只保存PNG文件）")
+    parser.add_argument('--draft', action='store_true', help="草稿模式：以低分辨率快速保存图表，用于预览中间结果")
+    args = parser.parse_args()
+    
+    if not args.show:
+        # 无需显示窗口时使用非交互式后端，只渲染一次用于保存文件
+        import matplotlib
+        matplotlib.use('Agg')
+    
     # 创建应用实例
-    app = FinancialAnalysisApplication()
+    app = FinancialAnalysisApplication(show_charts=args.show, draft_charts=args.draft)
     
     # 运行所有任务
     success = app.run_all_tasks()
@@ -548,8 +592,9 @@ def main():
     else:
         print("\n⚠️  程序执行未完全成功，请检查错误信息。")
     
-    # 保持窗口打开以查看图表
-    input("\n按回车键退出...")
+    if args.show:
+        # 保持窗口打开以查看图表
+        input("\n按回车键退出...")
 
 
 if __name__ == "__main__":
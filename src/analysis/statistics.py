@@ -6,12 +6,56 @@ import pandas as pd
 import numpy as np
 import sys
 import os
+import time
+import pickle
+import hashlib
 from datetime import datetime, timedelta
 
-# 添加父目录到Python路径
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from utils.config import PATHS
+# 添加父目录到Python路径（已在路径中时不再重复添加）
+_src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if _src_dir not in sys.path:
+    sys.path.append(_src_dir)
+from utils.config import PATHS, CACHE_CONFIG
 from utils.helpers import ensure_directory_exists, calculate_returns
+from utils.kernels import NUMBA_AVAILABLE, summarize, max_drawdown as calculate_max_drawdown
+
+# 报告结构变化时递增，使旧缓存失效
+REPORT_CACHE_VERSION = 1
+
+# 年化使用的交易日数
+TRADING_DAYS_PER_YEAR = 252
+SQRT_TRADING_DAYS = np.sqrt(TRADING_DAYS_PER_YEAR)
+
+
+def _update_hash(hasher, obj):
+    """
+    将报告输入（嵌套的dict/Series/标量）逐项写入哈希
+    
+    Parameters:
+    hasher: hashlib对象 - 哈希累加器
+    obj: object - 待哈希的对象
+    """
+    if isinstance(obj, dict):
+        for key in sorted(obj, key=str):
+            hasher.update(str(key).encode('utf-8'))
+            _update_hash(hasher, obj[key])
+    elif isinstance(obj, (pd.Series, pd.DataFrame, pd.Index)):
+        # hash_pandas_object只覆盖数值和索引，列名/序列名单独写入
+        names = list(obj.columns) if isinstance(obj, pd.DataFrame) else [obj.name]
+        hasher.update(repr(names).encode('utf-8'))
+        hasher.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, np.ndarray):
+        # 按完整内容哈希（repr会截断大数组，不同输入可能得到相同的键），并写入类型和形状
+        hasher.update(f"{obj.dtype.str}{obj.shape}".encode('utf-8'))
+        if obj.dtype == object:
+            hasher.update(pd.util.hash_array(obj.ravel()).tobytes())
+        else:
+            hasher.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            _update_hash(hasher, item)
+    else:
+        hasher.update(repr(obj).encode('utf-8'))
 
 
 class QuantitativeStatistics:
@@ -22,11 +66,50 @@ class QuantitativeStatistics:
         初始化量化统计分析
         
         Parameters:
-        data: DataFrame - 包含OHLCV数据的DataFrame
+        data: DataFrame - 包含OHLCV数据的DataFrame（只读引用，统计期间调用方不应原地修改）
         """
-        self.data = data.copy()
-        self.returns = calculate_returns(data['Close'])
+        # 各方法只读取数据，直接引用而不复制
+        self.data = data
+        # 常用列的float64数组只提取一次，各统计方法直接使用
+        self._close_arr = self.data['Close'].to_numpy(dtype=np.float64)
+        self._ret_arr, self.returns = self._calculate_daily_returns()
+        # 成交量只在基础统计中使用，首次用到时再提取（没有成交量列的数据也可做其他统计）
+        self._vol_arr = None
+        # 数据视为只读，统计结果首次计算后缓存
+        self._basic_stats = None
+        self._risk_metrics = None
+        self._returns_summary = None
+        
+    def _calculate_daily_returns(self):
+        """
+        在收盘价数组上直接计算日收益率（与pct_change().dropna()结果一致）
         
+        Returns:
+        tuple: (ret_arr, returns) - 收益率ndarray及对应的Series
+        """
+        close_arr = self._close_arr
+        close_series = self.data['Close']
+        
+        # 含缺失值时保留pandas的处理方式
+        if np.isnan(close_arr).any():
+            returns = calculate_returns(close_series)
+            return returns.to_numpy(dtype=np.float64), returns
+        
+        # 与pct_change相同的运算顺序：先相除再减1，写入同一个缓冲区
+        ret_arr = np.empty(max(close_arr.size - 1, 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(close_arr[1:], close_arr[:-1], out=ret_arr)
+        np.subtract(ret_arr, 1.0, out=ret_arr)
+        index = close_series.index[1:]
+        
+        # 0/0产生的NaN与dropna一样剔除
+        valid = ~np.isnan(ret_arr)
+        if not valid.all():
+            ret_arr = ret_arr[valid]
+            index = index[valid]
+        
+        return ret_arr, pd.Series(ret_arr, index=index, name=close_series.name)
+    
     def calculate_basic_stats(self):
         """
         计算基础统计指标
@@ -34,44 +117,90 @@ class QuantitativeStatistics:
         Returns:
         dict - 基础统计指标
         """
-        close_prices = self.data['Close']
+        if self._basic_stats is not None:
+            return self._basic_stats
+        
+        close_arr = self._close_arr
+        
+        # 每个序列只遍历一次，同时得到均值、标准差、极值和正负计数
+        price = self._summarize(close_arr)
+        rets = self._get_returns_summary()
+        if self._vol_arr is None:
+            self._vol_arr = self.data['Volume'].to_numpy(dtype=np.float64)
+        volume = self._summarize(self._vol_arr)
         
         # 价格统计
         price_stats = {
-            'current_price': close_prices.iloc[-1],
-            'max_price': close_prices.max(),
-            'min_price': close_prices.min(),
-            'avg_price': close_prices.mean(),
-            'price_std': close_prices.std(),
-            'price_range': close_prices.max() - close_prices.min()
+            'current_price': close_arr[-1],
+            'max_price': price['max'],
+            'min_price': price['min'],
+            'avg_price': price['mean'],
+            'price_std': price['std'],
+            'price_range': price['max'] - price['min']
         }
         
         # 收益率统计
         returns_stats = {
-            'total_return': (close_prices.iloc[-1] / close_prices.iloc[0] - 1) * 100,
-            'avg_daily_return': self.returns.mean() * 100,
-            'return_volatility': self.returns.std() * 100,
-            'max_daily_return': self.returns.max() * 100,
-            'min_daily_return': self.returns.min() * 100,
-            'positive_days': (self.returns > 0).sum(),
-            'negative_days': (self.returns < 0).sum(),
-            'win_rate': (self.returns > 0).mean() * 100
+            'total_return': (close_arr[-1] / close_arr[0] - 1) * 100,
+            'avg_daily_return': rets['mean'] * 100,
+            'return_volatility': rets['std'] * 100,
+            'max_daily_return': rets['max'] * 100,
+            'min_daily_return': rets['min'] * 100,
+            'positive_days': rets['positive'],
+            'negative_days': rets['negative'],
+            'win_rate': rets['positive'] / self._ret_arr.size * 100 if self._ret_arr.size > 0 else np.nan
         }
         
         # 成交量统计
         volume_stats = {
-            'avg_volume': self.data['Volume'].mean(),
-            'max_volume': self.data['Volume'].max(),
-            'min_volume': self.data['Volume'].min(),
-            'volume_std': self.data['Volume'].std()
+            'avg_volume': volume['mean'],
+            'max_volume': volume['max'],
+            'min_volume': volume['min'],
+            'volume_std': volume['std']
         }
         
-        return {
+        self._basic_stats = {
             'price_stats': price_stats,
             'returns_stats': returns_stats,
             'volume_stats': volume_stats,
             'trading_days': len(self.data)
         }
+        
+        return self._basic_stats
+    
+    def _get_returns_summary(self):
+        """获取日收益率的汇总统计，基础统计与风险指标共用一次计算结果"""
+        if self._returns_summary is None:
+            self._returns_summary = self._summarize(self._ret_arr)
+        return self._returns_summary
+    
+    @staticmethod
+    def _summarize(values):
+        """
+        计算序列的均值、标准差、极值和正负元素个数
+        
+        Parameters:
+        values: ndarray - float64数值序列
+        
+        Returns:
+        dict - 包含mean/std/min/max/positive/negative的字典
+        """
+        if NUMBA_AVAILABLE:
+            mean, std, minimum, maximum, positive, negative = summarize(values)
+        else:
+            series = pd.Series(values)
+            mean, std = series.mean(), series.std()
+            minimum, maximum = series.min(), series.max()
+            positive, negative = (series > 0).sum(), (series < 0).sum()
+        
+        return {
+            'mean': mean,
+            'std': std,
+            'min': minimum,
+            'max': maximum,
+            'positive': int(positive),
+            'negative': int(negative)
+        }
     
     def calculate_risk_metrics(self):
         """
@@ -80,30 +209,46 @@ class QuantitativeStatistics:
         Returns:
         dict - 风险指标
         """
-        returns = self.returns
+        if self._risk_metrics is not None:
+            return self._risk_metrics
+        
+        ret_arr = self._ret_arr
+        rets = self._get_returns_summary()
+        ret_mean = rets['mean']
+        ret_std = rets['std']
         
         # 最大回撤
-        cumulative_returns = (1 + returns).cumprod()
-        rolling_max = cumulative_returns.expanding().max()
-        drawdown = (cumulative_returns - rolling_max) / rolling_max
-        max_drawdown = drawdown.min() * 100
+        if NUMBA_AVAILABLE:
+            # 单次遍历同时维护累计净值和历史峰值
+            max_drawdown = calculate_max_drawdown(ret_arr) * 100
+        elif ret_arr.size > 0:
+            # 直接在数组上用ufunc累积，避免pandas expanding窗口的开销
+            cumulative_returns = np.cumprod(1.0 + ret_arr)
+            rolling_max = np.maximum.accumulate(cumulative_returns)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                drawdown = (cumulative_returns - rolling_max) / rolling_max
+            max_drawdown = np.nanmin(drawdown) * 100
+        else:
+            max_drawdown = np.nan
         
-        # VaR (Value at Risk) - 95%置信度
-        var_95 = np.percentile(returns, 5) * 100
-        var_99 = np.percentile(returns, 1) * 100
+        # VaR (Value at Risk) - 99%和95%置信度，一次调用同时求两个分位数
+        var_99, var_95 = np.percentile(ret_arr, [1, 5]) * 100
         
-        # 下行波动率
-        negative_returns = returns[returns < 0]
-        downside_volatility = negative_returns.std() * 100 if len(negative_returns) > 0 else 0
+        # 下行波动率（单个负收益时样本标准差无定义，与pandas一样返回NaN）
+        negative_returns = ret_arr[ret_arr < 0]
+        if negative_returns.size > 1:
+            downside_volatility = negative_returns.std(ddof=1) * 100
+        else:
+            downside_volatility = np.nan if negative_returns.size == 1 else 0
         
         # 夏普比率（简化版，假设无风险利率为0）
-        sharpe_ratio = returns.mean() / returns.std() if returns.std() != 0 else 0
+        sharpe_ratio = ret_mean / ret_std if ret_std != 0 else 0
         
         # Calmar比率（年化收益率/最大回撤）
-        annual_return = ((1 + returns.mean()) ** 252 - 1) * 100
+        annual_return = ((1 + ret_mean) ** TRADING_DAYS_PER_YEAR - 1) * 100
         calmar_ratio = abs(annual_return / max_drawdown) if max_drawdown != 0 else 0
         
-        return {
+        self._risk_metrics = {
             'max_drawdown': max_drawdown,
             'var_95': var_95,
             'var_99': var_99,
@@ -111,8 +256,10 @@ class QuantitativeStatistics:
             'sharpe_ratio': sharpe_ratio,
             'calmar_ratio': calmar_ratio,
             'annual_return': annual_return,
-            'annual_volatility': returns.std() * np.sqrt(252) * 100
+            'annual_volatility': ret_std * SQRT_TRADING_DAYS * 100
         }
+        
+        return self._risk_metrics
     
     def analyze_signal_performance(self, signals, holding_days=5):
         """
@@ -126,71 +273,101 @@ class QuantitativeStatistics:
         dict - 信号表现分析
         """
         performance_results = {}
+        # 所有信号共用同一份持有期收益率数组，每个信号只需按位置取值
+        forward_returns = self._calculate_forward_returns(holding_days)
         
         for signal_name, signal_series in signals.items():
             if isinstance(signal_series, pd.Series) and signal_series.dtype == bool:
-                signal_returns = self._calculate_signal_returns(signal_series, holding_days)
+                signal_returns = self._calculate_signal_returns(signal_series, holding_days, forward_returns)
                 performance_results[signal_name] = signal_returns
         
         return performance_results
     
-    def _calculate_signal_returns(self, signal_series, holding_days):
+    def _calculate_forward_returns(self, holding_days):
+        """
+        计算每个交易日买入、持有holding_days天后的收益率
+        
+        Parameters:
+        holding_days: int - 持有天数
+        
+        Returns:
+        ndarray - 第i个元素为第i日买入的收益率，长度为交易日数减去持有天数
+        """
+        close_arr = self._close_arr
+        n_entries = max(close_arr.size - holding_days, 0)
+        entry_prices = close_arr[:n_entries]
+        exit_prices = close_arr[holding_days:holding_days + n_entries]
+        # 只有信号日的收益率会被使用，其余位置的除零无需告警
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (exit_prices - entry_prices) / entry_prices
+    
+    def _calculate_signal_returns(self, signal_series, holding_days, forward_returns=None):
         """
         计算特定信号的收益率
         
         Parameters:
         signal_series: Series - 布尔类型的信号序列
         holding_days: int - 持有天数
+        forward_returns: ndarray - 预先计算的持有期收益率，为None时自动计算
         
         Returns:
         dict - 信号收益率统计
         """
-        signal_points = signal_series[signal_series].index
-        returns_list = []
-        
-        for signal_date in signal_points:
-            # 找到信号在数据中的位置
-            try:
-                signal_idx = self.data.index.get_loc(signal_date)
-                
-                # 确保有足够的后续数据
-                if signal_idx + holding_days < len(self.data):
-                    entry_price = self.data['Close'].iloc[signal_idx]
-                    exit_price = self.data['Close'].iloc[signal_idx + holding_days]
-                    
-                    return_rate = (exit_price - entry_price) / entry_price
-                    returns_list.append(return_rate)
-            except (KeyError, IndexError):
-                continue
-        
-        if returns_list:
-            avg_return = np.mean(returns_list) * 100
-            win_rate = sum(1 for r in returns_list if r > 0) / len(returns_list) * 100
-            max_return = np.max(returns_list) * 100
-            min_return = np.min(returns_list) * 100
+        if forward_returns is None:
+            forward_returns = self._calculate_forward_returns(holding_days)
+        total_trades = int(np.count_nonzero(signal_series.to_numpy()))
+        
+        # 信号位置：索引一致时直接取True的下标，否则批量查找信号日期在数据中的位置
+        if signal_series.index.equals(self.data.index):
+            positions = np.flatnonzero(signal_series.to_numpy())
+        else:
+            signal_points = signal_series.index[signal_series.to_numpy()]
+            positions = self.data.index.get_indexer(signal_points)
+            # 不在数据中的信号日期（-1）不参与统计
+            positions = positions[positions >= 0]
+        
+        # 只保留有足够后续数据的信号
+        positions = positions[positions < forward_returns.size]
+        returns = forward_returns[positions]
+        
+        if returns.size > 0:
+            avg_return = returns.mean() * 100
+            win_rate = np.count_nonzero(returns > 0) / returns.size * 100
+            max_return = returns.max() * 100
+            min_return = returns.min() * 100
         else:
             avg_return = win_rate = max_return = min_return = 0
         
         return {
-            'signal_count': len(returns_list),
+            'signal_count': int(returns.size),
             'avg_return': avg_return,
             'win_rate': win_rate,
             'max_return': max_return,
             'min_return': min_return,
-            'total_trades': len(signal_points)
+            'total_trades': total_trades
         }
     
-    def generate_performance_report(self, indicators_data=None, signals_data=None):
+    def generate_performance_report(self, indicators_data=None, signals_data=None, use_cache=True):
         """
-        生成综合表现报告
+        生成综合表现报告（相同输入直接读取缓存结果）
         
         Parameters:
         indicators_data: dict - 技术指标数据
         signals_data: dict - 交易信号数据
+        use_cache: bool - 是否使用报告缓存
         
         Returns:
         dict - 综合表现报告
         """
+        cache_path = None
+        if use_cache and CACHE_CONFIG['enabled']:
+            cache_key = self._get_report_cache_key(indicators_data, signals_data)
+            cache_path = os.path.join(PATHS['cache'], f"report_{cache_key}.pkl")
+            report = self._load_cached_report(cache_path)
+            if report is not None:
+                report['report_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                return report
+        
         report = {
             'report_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'stock_symbol': 'N/A',  # 可以从外部传入
@@ -215,8 +392,64 @@ class QuantitativeStatistics:
         if indicators_data:
             report['indicators_summary'] = self._summarize_indicators(indicators_data)
         
+        if cache_path is not None:
+            self._save_cached_report(report, cache_path)
+        
         return report
     
+    def _get_report_cache_key(self, indicators_data, signals_data):
+        """
+        根据行情数据、指标数据和信号数据的内容生成缓存键
+        
+        Returns:
+        str - 十六进制哈希值
+        """
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(str(REPORT_CACHE_VERSION).encode('utf-8'))
+        _update_hash(hasher, self.data)
+        _update_hash(hasher, indicators_data or {})
+        _update_hash(hasher, signals_data or {})
+        return hasher.hexdigest()
+    
+    def _load_cached_report(self, cache_path):
+        """
+        读取未过期的报告缓存
+        
+        Parameters:
+        cache_path: str - 缓存文件路径
+        
+        Returns:
+        dict or None - 缓存不存在、已过期或读取失败时返回None
+        """
+        if not os.path.exists(cache_path):
+            return None
+        
+        age_hours = (time.time() - os.path.getmtime(cache_path)) / 3600
+        if age_hours > CACHE_CONFIG['ttl_hours']:
+            return None
+        
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"读取报告缓存失败，将重新计算：{str(e)}")
+            return None
+    
+    def _save_cached_report(self, report, cache_path):
+        """
+        保存报告缓存，写入失败不影响主流程
+        
+        Parameters:
+        report: dict - 报告数据
+        cache_path: str - 缓存文件路径
+        """
+        try:
+            ensure_directory_exists(os.path.dirname(cache_path))
+            with open(cache_path, 'wb') as f:
+                pickle.dump(report, f)
+        except Exception as e:
+            print(f"写入报告缓存失败：{str(e)}")
+    
     def _summarize_indicators(self, indicators_data):
         """
         总结技术指标状态
@@ -232,16 +465,13 @@ class QuantitativeStatistics:
         # 移动平均线摘要
         if 'ma_data' in indicators_data:
             ma_data = indicators_data['ma_data']
-            current_price = self.data['Close'].iloc[-1]
+            current_price = self._close_arr[-1]
             
-            above_ma_count = 0
-            total_ma_count = 0
-            
-            for ma_name, ma_series in ma_data.items():
-                if not ma_series.isna().iloc[-1]:
-                    total_ma_count += 1
-                    if current_price > ma_series.iloc[-1]:
-                        above_ma_count += 1
+            # 各均线最新值组成数组，一次比较得到站上均线的数量
+            last_values = np.array([ma_series.values[-1] for ma_series in ma_data.values()], dtype=np.float64)
+            valid_values = last_values[~np.isnan(last_values)]
+            total_ma_count = valid_values.size
+            above_ma_count = int(np.count_nonzero(current_price > valid_values))
             
             summary['moving_averages'] = {
                 'above_ma_ratio': above_ma_count / max(1, total_ma_count),
@@ -251,10 +481,10 @@ class QuantitativeStatistics:
         # 布林带摘要
         if 'bollinger_data' in indicators_data:
             bb_data = indicators_data['bollinger_data']
-            current_price = self.data['Close'].iloc[-1]
+            current_price = self._close_arr[-1]
             
-            upper = bb_data['BB_Upper'].iloc[-1]
-            lower = bb_data['BB_Lower'].iloc[-1]
+            upper = bb_data['BB_Upper'].values[-1]
+            lower = bb_data['BB_Lower'].values[-1]
             
             if current_price > upper:
                 bb_position = '突破上轨'
@@ -272,12 +502,15 @@ class QuantitativeStatistics:
         # MACD摘要
         if 'macd_data' in indicators_data:
             macd_data = indicators_data['macd_data']
+            # 直接取底层数组的最后一个元素，避免逐个构造iloc索引器
+            macd_value = macd_data['MACD'].values[-1]
+            signal_value = macd_data['Signal'].values[-1]
             
             summary['macd'] = {
-                'macd_value': macd_data['MACD'].iloc[-1],
-                'signal_value': macd_data['Signal'].iloc[-1],
-                'histogram': macd_data['Histogram'].iloc[-1],
-                'trend': '金叉' if macd_data['MACD'].iloc[-1] > macd_data['Signal'].iloc[-1] else '死叉'
+                'macd_value': macd_value,
+                'signal_value': signal_value,
+                'histogram': macd_data['Histogram'].values[-1],
+                'trend': '金叉' if macd_value > signal_value else '死叉'
             }
         
         return summary
@@ -312,65 +545,69 @@ class QuantitativeStatistics:
         file: file object - 文件对象
         report: dict - 报告数据
         """
-        file.write("=" * 80 + "\n")
-        file.write("量化分析报告\n")
-        file.write("=" * 80 + "\n")
-        file.write(f"生成时间: {report['report_date']}\n")
-        file.write(f"股票代码: {report['stock_symbol']}\n")
-        file.write(f"分析期间: {report['analysis_period']['start_date']} 至 {report['analysis_period']['end_date']}\n")
-        file.write(f"交易天数: {report['analysis_period']['trading_days']} 天\n\n")
+        # 先拼接全部内容，最后一次性写入文件
+        parts = []
+        parts.append("=" * 80 + "\n")
+        parts.append("量化分析报告\n")
+        parts.append("=" * 80 + "\n")
+        parts.append(f"生成时间: {report['report_date']}\n")
+        parts.append(f"股票代码: {report['stock_symbol']}\n")
+        parts.append(f"分析期间: {report['analysis_period']['start_date']} 至 {report['analysis_period']['end_date']}\n")
+        parts.append(f"交易天数: {report['analysis_period']['trading_days']} 天\n\n")
         
         # 基础统计
-        file.write("-" * 40 + " 基础统计 " + "-" * 40 + "\n")
+        parts.append("-" * 40 + " 基础统计 " + "-" * 40 + "\n")
         price_stats = report['basic_stats']['price_stats']
         returns_stats = report['basic_stats']['returns_stats']
         
-        file.write(f"当前价格: {price_stats['current_price']:.2f}\n")
-        file.write(f"最高价格: {price_stats['max_price']:.2f}\n")
-        file.write(f"最低价格: {price_stats['min_price']:.2f}\n")
-        file.write(f"平均价格: {price_stats['avg_price']:.2f}\n")
-        file.write(f"总收益率: {returns_stats['total_return']:+.2f}%\n")
-        file.write(f"平均日收益率: {returns_stats['avg_daily_return']:+.4f}%\n")
-        file.write(f"收益波动率: {returns_stats['return_volatility']:.4f}%\n")
-        file.write(f"胜率: {returns_stats['win_rate']:.1f}%\n\n")
+        parts.append(f"当前价格: {price_stats['current_price']:.2f}\n")
+        parts.append(f"最高价格: {price_stats['max_price']:.2f}\n")
+        parts.append(f"最低价格: {price_stats['min_price']:.2f}\n")
+        parts.append(f"平均价格: {price_stats['avg_price']:.2f}\n")
+        parts.append(f"总收益率: {returns_stats['total_return']:+.2f}%\n")
+        parts.append(f"平均日收益率: {returns_stats['avg_daily_return']:+.4f}%\n")
+        parts.append(f"收益波动率: {returns_stats['return_volatility']:.4f}%\n")
+        parts.append(f"胜率: {returns_stats['win_rate']:.1f}%\n\n")
         
         # 风险指标
-        file.write("-" * 40 + " 风险指标 " + "-" * 40 + "\n")
+        parts.append("-" * 40 + " 风险指标 " + "-" * 40 + "\n")
         risk_metrics = report['risk_metrics']
         
-        file.write(f"最大回撤: {risk_metrics['max_drawdown']:-.2f}%\n")
-        file.write(f"VaR(95%): {risk_metrics['var_95']:-.2f}%\n")
-        file.write(f"夏普比率: {risk_metrics['sharpe_ratio']:.4f}\n")
-        file.write(f"年化收益率: {risk_metrics['annual_return']:+.2f}%\n")
-        file.write(f"年化波动率: {risk_metrics['annual_volatility']:.2f}%\n\n")
+        parts.append(f"最大回撤: {risk_metrics['max_drawdown']:-.2f}%\n")
+        parts.append(f"VaR(95%): {risk_metrics['var_95']:-.2f}%\n")
+        parts.append(f"夏普比率: {risk_metrics['sharpe_ratio']:.4f}\n")
+        parts.append(f"年化收益率: {risk_metrics['annual_return']:+.2f}%\n")
+        parts.append(f"年化波动率: {risk_metrics['annual_volatility']:.2f}%\n\n")
         
         # 信号表现
         if 'signal_performance' in report:
-            file.write("-" * 40 + " 信号表现 " + "-" * 40 + "\n")
+            parts.append("-" * 40 + " 信号表现 " + "-" * 40 + "\n")
             for signal_name, performance in report['signal_performance'].items():
-                file.write(f"\n{signal_name}:\n")
-                file.write(f"  信号总数: {performance['total_trades']}\n")
-                file.write(f"  有效交易: {performance['signal_count']}\n")
-                file.write(f"  平均收益: {performance['avg_return']:+.2f}%\n")
-                file.write(f"  胜率: {performance['win_rate']:.1f}%\n")
-            file.write("\n")
+                parts.append(f"\n{signal_name}:\n")
+                parts.append(f"  信号总数: {performance['total_trades']}\n")
+                parts.append(f"  有效交易: {performance['signal_count']}\n")
+                parts.append(f"  平均收益: {performance['avg_return']:+.2f}%\n")
+                parts.append(f"  胜率: {performance['win_rate']:.1f}%\n")
+            parts.append("\n")
         
         # 技术指标摘要
         if 'indicators_summary' in report:
-            file.write("-" * 40 + " 技术指标摘要 " + "-" * 40 + "\n")
+            parts.append("-" * 40 + " 技术指标摘要 " + "-" * 40 + "\n")
             summary = report['indicators_summary']
             
             if 'moving_averages' in summary:
                 ma_info = summary['moving_averages']
-                file.write(f"均线状态: {ma_info['trend_status']} (多头排列比例: {ma_info['above_ma_ratio']:.0%})\n")
+                parts.append(f"均线状态: {ma_info['trend_status']} (多头排列比例: {ma_info['above_ma_ratio']:.0%})\n")
             
             if 'macd' in summary:
                 macd_info = summary['macd']
-                file.write(f"MACD状态: {macd_info['trend']} (MACD: {macd_info['macd_value']:.4f})\n")
+                parts.append(f"MACD状态: {macd_info['trend']} (MACD: {macd_info['macd_value']:.4f})\n")
             
             if 'bollinger_bands' in summary:
                 bb_info = summary['bollinger_bands']
-                file.write(f"布林带位置: {bb_info['position']}\n")
+                parts.append(f"布林带位置: {bb_info['position']}\n")
+        
+        file.write(''.join(parts))
 
 
 def generate_comprehensive_analysis(data, indicators_data=None, signals_data=None):
@@ -3,16 +3,19 @@
 """
 
 import pandas as pd
-import tushare as ts
 import numpy as np
 from datetime import datetime
 import sys
 import os
+import time
 
-# 添加父目录到Python路径
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from utils.config import DEFAULT_STOCK_CODE, DEFAULT_START_DATE, DEFAULT_END_DATE
-from utils.helpers import load_tushare_token, clean_stock_data, format_date_for_tushare
+# 添加父目录到Python路径（已在路径中时不再重复添加）
+_src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if _src_dir not in sys.path:
+    sys.path.append(_src_dir)
+from utils.config import DEFAULT_STOCK_CODE, DEFAULT_START_DATE, DEFAULT_END_DATE, PATHS, CACHE_CONFIG
+from utils.helpers import (load_tushare_token, clean_stock_data, format_date_for_tushare,
+                           ensure_directory_exists, resample_ohlcv)
 
 
 class StockDataLoader:
@@ -21,17 +24,26 @@ class StockDataLoader:
     def __init__(self):
         """初始化数据加载器"""
         self.token = load_tushare_token()
-        ts.set_token(self.token)
-        self.pro = ts.pro_api()
+        self.pro = None  # Tushare接口在首次请求时创建，命中缓存时无需导入tushare
+    
+    def _get_pro_api(self):
+        """获取Tushare pro接口，首次调用时导入tushare并完成初始化"""
+        if self.pro is None:
+            import tushare as ts
+            
+            ts.set_token(self.token)
+            self.pro = ts.pro_api()
+        return self.pro
         
-    def get_daily_data(self, ts_code=None, start_date=None, end_date=None):
+    def get_daily_data(self, ts_code=None, start_date=None, end_date=None, force_refresh=False):
         """
-        获取股票日线数据
+        获取股票日线数据（优先读取本地parquet缓存）
         
         Parameters:
         ts_code: str - 股票代码，默认为配置中的默认股票
         start_date: str - 开始日期，格式YYYYMMDD
         end_date: str - 结束日期，格式YYYYMMDD
+        force_refresh: bool - 是否忽略缓存强制重新获取
         
         Returns:
         DataFrame - 股票日线数据
@@ -48,15 +60,24 @@ class StockDataLoader:
         start_date = format_date_for_tushare(start_date)
         end_date = format_date_for_tushare(end_date)
         
+        # 命中缓存直接返回
+        cache_path = self._get_cache_path(ts_code, start_date, end_date, 'daily')
+        if not force_refresh:
+            df = self._load_cache(cache_path, end_date)
+            if df is not None:
+                print(f"从缓存读取股票 {ts_code} 数据，时间范围：{start_date} 到 {end_date}，共 {len(df)} 条记录")
+                return df
+        
         try:
             # 获取数据
-            df = self.pro.daily(ts_code=ts_code, start_date=start_date, end_date=end_date)
+            df = self._get_pro_api().daily(ts_code=ts_code, start_date=start_date, end_date=end_date)
             
             if df.empty:
                 raise ValueError(f"未获取到股票 {ts_code} 的数据，请检查股票代码和日期范围")
             
             # 数据预处理
             df = self._preprocess_data(df)
+            self._save_cache(df, cache_path)
             
             print(f"成功获取股票 {ts_code} 数据，时间范围：{start_date} 到 {end_date}，共 {len(df)} 条记录")
             return df
@@ -65,6 +86,61 @@ class StockDataLoader:
             print(f"获取股票数据失败：{str(e)}")
             raise e
     
+    def _get_cache_path(self, ts_code, start_date, end_date, freq):
+        """
+        生成缓存文件路径，以(股票代码, 开始日期, 结束日期, 周期)为键
+        
+        Returns:
+        str - parquet缓存文件路径
+        """
+        filename = f"{ts_code}_{start_date}_{end_date}_{freq}.parquet"
+        return os.path.join(PATHS['cache'], filename)
+    
+    def _load_cache(self, cache_path, end_date=None):
+        """
+        读取未过期的缓存数据
+        
+        Parameters:
+        cache_path: str - 缓存文件路径
+        end_date: str - 数据结束日期(YYYYMMDD)，缓存写入时该日已过则行情不再变化，缓存不过期
+        
+        Returns:
+        DataFrame or None - 缓存不存在、已过期或读取失败时返回None
+        """
+        if not CACHE_CONFIG['enabled'] or not os.path.exists(cache_path):
+            return None
+        
+        mtime = os.path.getmtime(cache_path)
+        is_history = end_date is not None and datetime.fromtimestamp(mtime).strftime('%Y%m%d') > end_date
+        age_hours = (time.time() - mtime) / 3600
+        if not is_history and age_hours > CACHE_CONFIG['ttl_hours']:
+            return None
+        
+        try:
+            df = pd.read_parquet(cache_path, engine='pyarrow')
+            df.index = pd.DatetimeIndex(df.index)
+            return df
+        except Exception as e:
+            print(f"读取缓存失败，将重新获取数据：{str(e)}")
+            return None
+    
+    def _save_cache(self, df, cache_path):
+        """
+        将数据写入parquet缓存，写入失败不影响主流程
+        
+        Parameters:
+        df: DataFrame - 预处理后的数据
+        cache_path: str - 缓存文件路径
+        """
+        if not CACHE_CONFIG['enabled']:
+            return
+        
+        try:
+            ensure_directory_exists(os.path.dirname(cache_path))
+            df.to_parquet(cache_path, engine='pyarrow', compression='zstd')
+        except Exception as e:
+            print(f"写入缓存失败：{str(e)}")
+    
     def get_stock_basic_info(self, ts_code):
         """
         获取股票基本信息
@@ -76,7 +152,7 @@ class StockDataLoader:
         DataFrame - 股票基本信息
         """
         try:
-            df = self.pro.stock_basic(ts_code=ts_code, fields='ts_code,symbol,name,area,industry,market')
+            df = self._get_pro_api().stock_basic(ts_code=ts_code, fields='ts_code,symbol,name,area,industry,market')
             return df
         except Exception as e:
             print(f"获取股票基本信息失败：{str(e)}")
@@ -148,25 +224,11 @@ class StockDataLoader:
     
     def _convert_to_weekly(self, daily_data):
         """将日线数据转换为周线数据"""
-        weekly = daily_data.resample('W').agg({
-            'Open': 'first',
-            'High': 'max', 
-            'Low': 'min',
-            'Close': 'last',
-            'Volume': 'sum'
-        }).dropna()
-        return weekly
+        return resample_ohlcv(daily_data, 'W')
     
     def _convert_to_monthly(self, daily_data):
         """将日线数据转换为月线数据"""
-        monthly = daily_data.resample('M').agg({
-            'Open': 'first',
-            'High': 'max',
-            'Low': 'min', 
-            'Close': 'last',
-            'Volume': 'sum'
-        }).dropna()
-        return monthly
+        return resample_ohlcv(daily_data, 'M')
 
 
 # 便捷函数
@@ -6,10 +6,12 @@ from .ma_system import MovingAverageSystem, calculate_ma_system
 from .bollinger import BollingerBands, analyze_bollinger_bands
 from .kdj_rsi import KDJIndicator, RSIIndicator, KDJRSIComparator, analyze_kdj_rsi
 from .macd import MACDIndicator, analyze_macd
+from .pipeline import compute_all_indicators, compute_batch_indicators, build_indicators
 
 __all__ = [
     'MovingAverageSystem', 'calculate_ma_system',
     'BollingerBands', 'analyze_bollinger_bands',
     'KDJIndicator', 'RSIIndicator', 'KDJRSIComparator', 'analyze_kdj_rsi',
-    'MACDIndicator', 'analyze_macd'
+    'MACDIndicator', 'analyze_macd',
+    'compute_all_indicators', 'compute_batch_indicators', 'build_indicators'
 ]
@@ -9,9 +9,13 @@ import talib as tb
 import sys
 import os
 
-# 添加父目录到Python路径
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# 添加父目录到Python路径（已在路径中时不再重复添加）
+_src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if _src_dir not in sys.path:
+    sys.path.append(_src_dir)
 from utils.config import BOLLINGER_CONFIG
+from utils.helpers import calculate_sma, calculate_rolling_std, count_rising_edges
+from utils.kernels import NUMBA_AVAILABLE, bbands, rolling_mean_std
 
 
 class BollingerBands:
@@ -24,9 +28,16 @@ class BollingerBands:
         Parameters:
         data: DataFrame - 包含OHLCV数据的DataFrame
         """
-        self.data = data.copy()
-        self.close = data['Close'].values.astype(np.float64)
+        self.data = data.copy(deep=False)
+        self.close = np.ascontiguousarray(data['Close'].values, dtype=np.float64)
         self.bollinger_data = {}
+        # 宽度、%B和突破掩码的数组缓存，供后续方法直接使用
+        self._band_width = None
+        self._percent_b = None
+        self._upper_breakout = None
+        self._lower_breakout = None
+        # 带宽滚动均值和标准差的缓存，键为窗口长度
+        self._width_stats = {}
         
     def calculate_bollinger_bands(self, period=None, std_dev=None):
         """
@@ -44,26 +55,67 @@ class BollingerBands:
         if std_dev is None:
             std_dev = BOLLINGER_CONFIG['std_dev']
         
-        # 使用TA-Lib计算布林带
-        upper, middle, lower = tb.BBANDS(
-            self.close, 
-            timeperiod=period, 
-            nbdevup=std_dev, 
-            nbdevdn=std_dev, 
-            matype=0  # SMA
-        )
+        if NUMBA_AVAILABLE:
+            # 使用Numba内核单次遍历计算三条轨道、宽度和%B
+            upper, middle, lower, band_width, percent_b = bbands(self.close, period, float(std_dev))
+        else:
+            # 使用TA-Lib计算布林带
+            upper, middle, lower = tb.BBANDS(
+                self.close, 
+                timeperiod=period, 
+                nbdevup=std_dev, 
+                nbdevdn=std_dev, 
+                matype=0  # SMA
+            )
+            band_width = percent_b = None
+        
+        self.set_bollinger_bands(upper, middle, lower, band_width, percent_b)
+        return self.bollinger_data
+    
+    def set_bollinger_bands(self, upper, middle, lower, band_width=None, percent_b=None):
+        """
+        设置布林带计算结果，并同步数据列、清空依赖轨道的缓存
         
+        Parameters:
+        upper, middle, lower: ndarray - 上轨、中轨、下轨，长度与数据一致
+        band_width: ndarray - 已算好的布林带宽度，为None时按需计算
+        percent_b: ndarray - 已算好的%B，为None时按需计算
+        """
         self.bollinger_data = {
             'BB_Upper': pd.Series(upper, index=self.data.index),
             'BB_Middle': pd.Series(middle, index=self.data.index), 
             'BB_Lower': pd.Series(lower, index=self.data.index)
         }
         
-        # 添加到原数据中
-        for key, series in self.bollinger_data.items():
-            self.data[key] = series
-        
-        return self.bollinger_data
+        # 添加到原数据中（直接写入数组，索引相同无需按索引对齐）
+        for key, values in zip(self.bollinger_data, (upper, middle, lower)):
+            self.data[key] = values
+        self._band_width = band_width
+        self._percent_b = percent_b
+        self._upper_breakout = None
+        self._lower_breakout = None
+        self._width_stats = {}
+    
+    def _compute_derived(self):
+        """
+        在轨道数组上一次性计算宽度、%B和突破掩码
+        （Numba内核已算出宽度和%B时只计算突破掩码）
+        """
+        upper = self.bollinger_data['BB_Upper'].to_numpy(dtype=np.float64)
+        lower = self.bollinger_data['BB_Lower'].to_numpy(dtype=np.float64)
+        
+        if self._band_width is None or self._percent_b is None:
+            middle = self.bollinger_data['BB_Middle'].to_numpy(dtype=np.float64)
+            band_diff = upper - lower
+            with np.errstate(divide='ignore', invalid='ignore'):
+                # 布林带宽度 = (上轨 - 下轨) / 中轨
+                self._band_width = band_diff / middle
+                # %B = (收盘价 - 下轨) / (上轨 - 下轨)
+                self._percent_b = (self.close - lower) / band_diff
+        
+        # 收盘价在上轨之上/下轨之下（轨道为NaN时比较结果为False）
+        self._upper_breakout = self.close > upper
+        self._lower_breakout = self.close < lower
     
     def calculate_band_width(self):
         """
@@ -75,13 +127,12 @@ class BollingerBands:
         if not self.bollinger_data:
             self.calculate_bollinger_bands()
         
-        upper = self.bollinger_data['BB_Upper']
-        lower = self.bollinger_data['BB_Lower']
-        middle = self.bollinger_data['BB_Middle']
+        if self._band_width is None:
+            self._compute_derived()
         
-        # 布林带宽度 = (上轨 - 下轨) / 中轨
-        band_width = (upper - lower) / middle
-        self.data['BB_Width'] = band_width
+        band_width = pd.Series(self._band_width, index=self.data.index)
+        self.data['BB_Width'] = self._band_width
+        self._width_stats = {}
         
         return band_width
     
@@ -95,47 +146,81 @@ class BollingerBands:
         if not self.bollinger_data:
             self.calculate_bollinger_bands()
         
-        close_prices = pd.Series(self.close, index=self.data.index)
-        upper = self.bollinger_data['BB_Upper']
-        lower = self.bollinger_data['BB_Lower']
+        if self._percent_b is None:
+            self._compute_derived()
         
-        # %B = (收盘价 - 下轨) / (上轨 - 下轨)
-        percent_b = (close_prices - lower) / (upper - lower)
-        self.data['Percent_B'] = percent_b
+        percent_b = pd.Series(self._percent_b, index=self.data.index)
+        self.data['Percent_B'] = self._percent_b
         
         return percent_b
     
-    def identify_breakout_signals(self):
+    def get_width_statistics(self, window=20):
+        """
+        获取布林带宽度的滚动均值和标准差（同一窗口只计算一次）
+        
+        Parameters:
+        window: int - 滚动窗口长度
+        
+        Returns:
+        tuple: (width_ma, width_std) - 带宽滚动均值和滚动标准差序列
+        """
+        if 'BB_Width' not in self.data.columns:
+            self.calculate_band_width()
+        
+        if window not in self._width_stats:
+            band_width = self.data['BB_Width']
+            if NUMBA_AVAILABLE:
+                # Numba内核单次遍历同时得到滚动均值和标准差
+                width_ma, width_std = rolling_mean_std(band_width.to_numpy(dtype=np.float64), window)
+                self._width_stats[window] = (
+                    pd.Series(width_ma, index=band_width.index),
+                    pd.Series(width_std, index=band_width.index)
+                )
+            else:
+                self._width_stats[window] = (
+                    calculate_sma(band_width, window),
+                    calculate_rolling_std(band_width, window)
+                )
+        
+        return self._width_stats[window]
+    
+    def identify_breakout_signals(self, include_series=True):
         """
         识别布林带突破信号
         
+        Parameters:
+        include_series: bool - 是否返回完整的布尔信号序列，False时只返回突破次数
+        
         Returns:
         dict - 包含突破信号的字典
         """
         if not self.bollinger_data:
             self.calculate_bollinger_bands()
         
-        close_prices = pd.Series(self.close, index=self.data.index)
-        upper = self.bollinger_data['BB_Upper']
-        lower = self.bollinger_data['BB_Lower']
+        if self._upper_breakout is None:
+            self._compute_derived()
+        
+        # 突破次数即从不突破到突破的转换次数，无需生成时点数组
+        upper_count = count_rising_edges(self._upper_breakout)
+        lower_count = count_rising_edges(self._lower_breakout)
         
-        # 突破上轨信号（强势）
-        upper_breakout = (close_prices > upper).fillna(False)
-        # 跌破下轨信号（弱势）
-        lower_breakout = (close_prices < lower).fillna(False)
+        if not include_series:
+            return {'upper_count': upper_count, 'lower_count': lower_count}
         
-        # 突破上轨后的时点（从不突破到突破）
-        upper_breakout_points = upper_breakout & (~upper_breakout.shift(1).fillna(False))
-        # 跌破下轨后的时点
-        lower_breakout_points = lower_breakout & (~lower_breakout.shift(1).fillna(False))
+        # 突破上轨/跌破下轨的时点（从不突破到突破）
+        upper_points = self._upper_breakout & ~np.r_[False, self._upper_breakout[:-1]]
+        lower_points = self._lower_breakout & ~np.r_[False, self._lower_breakout[:-1]]
         
+        index = self.data.index
         breakout_signals = {
-            'upper_breakout': upper_breakout,
-            'lower_breakout': lower_breakout,
-            'upper_breakout_points': upper_breakout_points,
-            'lower_breakout_points': lower_breakout_points,
-            'upper_count': upper_breakout_points.sum(),
-            'lower_count': lower_breakout_points.sum()
+            # 突破上轨信号（强势）
+            'upper_breakout': pd.Series(self._upper_breakout, index=index),
+            # 跌破下轨信号（弱势）
+            'lower_breakout': pd.Series(self._lower_breakout, index=index),
+            'upper_breakout_points': pd.Series(upper_points, index=index),
+            'lower_breakout_points': pd.Series(lower_points, index=index),
+            'upper_count': upper_count,
+            'lower_count': lower_count
         }
         
         return breakout_signals
@@ -147,62 +232,53 @@ class BollingerBands:
         Returns:
         dict - 包含收窄分析的字典
         """
-        if 'BB_Width' not in self.data.columns:
-            self.calculate_band_width()
-        
+        width_ma, width_std = self.get_width_statistics(20)
         band_width = self.data['BB_Width']
-        close_prices = pd.Series(self.close, index=self.data.index)
-        
-        # 计算布林带宽度的滚动均值和标准差
-        width_ma = band_width.rolling(window=20).mean()
-        width_std = band_width.rolling(window=20).std()
         
         # 定义收窄：当前宽度小于均值减去一个标准差
         squeeze_condition = (band_width < (width_ma - width_std)).fillna(False)
         
-        # 找出收窄期间
-        squeeze_periods = []
-        in_squeeze = False
-        squeeze_start = None
-        
-        for i, is_squeeze in enumerate(squeeze_condition):
-            if is_squeeze and not in_squeeze:
-                # 开始收窄
-                squeeze_start = i
-                in_squeeze = True
-            elif not is_squeeze and in_squeeze:
-                # 结束收窄
-                if squeeze_start is not None:
-                    squeeze_periods.append((squeeze_start, i-1))
-                in_squeeze = False
-        
-        # 分析每次收窄后的突破方向
-        squeeze_analysis = []
-        for start_idx, end_idx in squeeze_periods:
-            if end_idx + 5 < len(self.data):  # 确保有足够的后续数据
-                # 收窄结束时的价格
-                end_price = close_prices.iloc[end_idx]
-                # 收窄结束后5日的价格
-                future_price = close_prices.iloc[end_idx + 5]
-                
-                # 判断突破方向
-                price_change = (future_price - end_price) / end_price
-                if price_change > 0.02:  # 向上突破（涨幅>2%）
-                    direction = '向上突破'
-                elif price_change < -0.02:  # 向下突破（跌幅>2%）
-                    direction = '向下突破'
-                else:
-                    direction = '横向整理'
-                
-                squeeze_analysis.append({
-                    'start_date': self.data.index[start_idx],
-                    'end_date': self.data.index[end_idx],
-                    'duration': end_idx - start_idx + 1,
-                    'end_price': end_price,
-                    'future_price': future_price,
-                    'price_change_pct': price_change * 100,
-                    'breakout_direction': direction
-                })
+        # 找出收窄期间：由差分得到进入(+1)和退出(-1)收窄的位置
+        edges = np.diff(np.r_[0, squeeze_condition.to_numpy().astype(np.int8)])
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1) - 1
+        # 数据末尾仍在收窄的期间尚未结束，不计入
+        starts = starts[:len(ends)]
+        squeeze_periods = list(zip(starts.tolist(), ends.tolist()))
+        
+        # 分析每次收窄后的突破方向（确保有足够的后续数据）
+        valid = ends + 5 < len(self.data)
+        valid_starts = starts[valid]
+        valid_ends = ends[valid]
+        # 收窄结束时的价格与结束后5日的价格
+        end_prices = self.close[valid_ends]
+        future_prices = self.close[valid_ends + 5]
+        price_changes = (future_prices - end_prices) / end_prices
+        
+        # 判断突破方向：涨幅>2%向上突破，跌幅>2%向下突破
+        directions = np.select(
+            [price_changes > 0.02, price_changes < -0.02],
+            ['向上突破', '向下突破'],
+            default='横向整理'
+        )
+        
+        # 各字段先整体计算，再按期间逐一打包，避免循环内逐个下标取值
+        durations = (valid_ends - valid_starts + 1).tolist()
+        squeeze_analysis = [
+            {
+                'start_date': start_date,
+                'end_date': end_date,
+                'duration': duration,
+                'end_price': end_price,
+                'future_price': future_price,
+                'price_change_pct': change_pct,
+                'breakout_direction': direction
+            }
+            for start_date, end_date, duration, end_price, future_price, change_pct, direction in zip(
+                self.data.index[valid_starts], self.data.index[valid_ends], durations,
+                end_prices, future_prices, price_changes * 100, directions.tolist()
+            )
+        ]
         
         return {
             'squeeze_condition': squeeze_condition,
@@ -223,17 +299,19 @@ class BollingerBands:
         
         # 获取最新数据
         current_price = self.close[-1]
-        upper = self.bollinger_data['BB_Upper'].iloc[-1]
-        middle = self.bollinger_data['BB_Middle'].iloc[-1]
-        lower = self.bollinger_data['BB_Lower'].iloc[-1]
+        upper = self.bollinger_data['BB_Upper'].values[-1]
+        middle = self.bollinger_data['BB_Middle'].values[-1]
+        lower = self.bollinger_data['BB_Lower'].values[-1]
         
         if 'BB_Width' not in self.data.columns:
             self.calculate_band_width()
-        current_width = self.data['BB_Width'].iloc[-1]
-        
         if 'Percent_B' not in self.data.columns:
             self.calculate_percent_b()
-        current_percent_b = self.data['Percent_B'].iloc[-1]
+        if self._band_width is None or self._percent_b is None:
+            self._compute_derived()
+        # 宽度和%B直接取缓存数组的最后一个值
+        current_width = self._band_width[-1]
+        current_percent_b = self._percent_b[-1]
         
         # 判断位置状态
         if current_price > upper:
@@ -245,8 +323,14 @@ class BollingerBands:
         else:
             position_status = '中轨下方'
         
-        # 判断宽度状态
-        width_ma = self.data['BB_Width'].rolling(window=20).mean().iloc[-1]
+        # 判断宽度状态：已有滚动统计时直接取最后一个值，否则只对最后20个值求均值
+        # （不足20个值或窗口内有NaN时为NaN，与rolling(20).mean()一致）
+        if 20 in self._width_stats:
+            width_ma = self._width_stats[20][0].values[-1]
+        elif len(self._band_width) >= 20:
+            width_ma = self._band_width[-20:].mean()
+        else:
+            width_ma = np.nan
         if current_width > width_ma * 1.2:
             width_status = '宽度较大'
         elif current_width < width_ma * 0.8:
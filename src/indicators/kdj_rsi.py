@@ -9,10 +9,13 @@ import talib as tb
 import sys
 import os
 
-# 添加父目录到Python路径
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# 添加父目录到Python路径（已在路径中时不再重复添加）
+_src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if _src_dir not in sys.path:
+    sys.path.append(_src_dir)
 from utils.config import KDJ_CONFIG, RSI_CONFIG
-from utils.helpers import calculate_returns
+from utils.helpers import calculate_returns, identify_cross_signals, count_signals, count_rising_edges
+from utils.kernels import NUMBA_AVAILABLE, stoch_kdj
 
 
 class KDJIndicator:
@@ -25,11 +28,12 @@ class KDJIndicator:
         Parameters:
         data: DataFrame - 包含OHLCV数据的DataFrame
         """
-        self.data = data.copy()
-        self.high = data['High'].values.astype(np.float64)
-        self.low = data['Low'].values.astype(np.float64)
-        self.close = data['Close'].values.astype(np.float64)
+        self.data = data.copy(deep=False)
+        self.high = np.ascontiguousarray(data['High'].values, dtype=np.float64)
+        self.low = np.ascontiguousarray(data['Low'].values, dtype=np.float64)
+        self.close = np.ascontiguousarray(data['Close'].values, dtype=np.float64)
         self.kdj_data = {}
+        self._signals = None
         
     def calculate_kdj(self, fastk_period=None, slowk_period=None, slowd_period=None):
         """
@@ -50,30 +54,48 @@ class KDJIndicator:
         if slowd_period is None:
             slowd_period = KDJ_CONFIG['slowd_period']
         
-        # 使用TA-Lib计算随机指标K和D
-        k_values, d_values = tb.STOCH(
-            self.high, self.low, self.close,
-            fastk_period=fastk_period,
-            slowk_period=slowk_period,
-            slowk_matype=0,  # SMA
-            slowd_period=slowd_period,
-            slowd_matype=0   # SMA
-        )
-        
-        # 计算J值：J = 3K - 2D
-        j_values = 3 * k_values - 2 * d_values
+        if NUMBA_AVAILABLE:
+            # 使用Numba内核一次性计算K、D、J
+            k_values, d_values, j_values = stoch_kdj(
+                self.high, self.low, self.close,
+                fastk_period, slowk_period, slowd_period
+            )
+        else:
+            # 使用TA-Lib计算随机指标K和D
+            k_values, d_values = tb.STOCH(
+                self.high, self.low, self.close,
+                fastk_period=fastk_period,
+                slowk_period=slowk_period,
+                slowk_matype=0,  # SMA
+                slowd_period=slowd_period,
+                slowd_matype=0   # SMA
+            )
+            
+            # 计算J值：J = 3K - 2D
+            j_values = 3 * k_values - 2 * d_values
+        
+        self.set_kdj(k_values, d_values, j_values)
+        return self.kdj_data
+    
+    def set_kdj(self, k_values, d_values, j_values):
+        """
+        设置KDJ计算结果，并同步数据列、清空交易信号缓存
         
+        Parameters:
+        k_values, d_values, j_values: ndarray - K、D、J值，长度与数据一致
+        """
         self.kdj_data = {
             'K': pd.Series(k_values, index=self.data.index),
             'D': pd.Series(d_values, index=self.data.index),
             'J': pd.Series(j_values, index=self.data.index)
         }
         
-        # 添加到原数据中
-        for key, series in self.kdj_data.items():
-            self.data[key] = series
+        # 添加到原数据中（直接写入数组，索引相同无需按索引对齐）
+        for key, values in zip(self.kdj_data, (k_values, d_values, j_values)):
+            self.data[key] = values
         
-        return self.kdj_data
+        # 指标已更新，交易信号需重新识别
+        self._signals = None
     
     def analyze_overbought_oversold(self, days=120):
         """
@@ -90,15 +112,18 @@ class KDJIndicator:
         
         # 获取最近指定天数的数据
         j_values = self.kdj_data['J'].tail(days)
+        j_array = j_values.to_numpy()
         
         # 超买区：J > 100
-        overbought_condition = j_values > 100
+        overbought_mask = j_array > 100
         # 超卖区：J < 0  
-        oversold_condition = j_values < 0
+        oversold_mask = j_array < 0
+        overbought_condition = pd.Series(overbought_mask, index=j_values.index)
+        oversold_condition = pd.Series(oversold_mask, index=j_values.index)
         
         # 统计进入超买超卖区域的次数
-        overbought_entries = self._count_entries(overbought_condition)
-        oversold_entries = self._count_entries(oversold_condition)
+        overbought_entries = self._count_entries(overbought_mask)
+        oversold_entries = self._count_entries(oversold_mask)
         
         analysis_result = {
             'analysis_days': days,
@@ -115,16 +140,17 @@ class KDJIndicator:
         计算进入某个区域的次数（从False变为True的次数）
         
         Parameters:
-        condition_series: Series - 布尔条件序列
+        condition_series: Series或ndarray - 布尔条件序列
         
         Returns:
         int - 进入次数
         """
-        # 填充NaN值，从不满足条件到满足条件的转换点
-        condition_series = condition_series.fillna(False)
-        prev_condition = condition_series.shift(1).fillna(False)
-        entries = condition_series & (~prev_condition)
-        return entries.sum()
+        # NaN视为不满足条件；首个元素之前视为不在区域内
+        mask = np.asarray(condition_series)
+        if mask.dtype != bool:
+            mask = np.asarray(pd.Series(condition_series).fillna(False), dtype=bool)
+        # 从不满足条件到满足条件的转换点
+        return count_rising_edges(mask)
     
     def calculate_overbought_returns(self, days=120, holding_days=5):
         """
@@ -140,47 +166,50 @@ class KDJIndicator:
         if not self.kdj_data:
             self.calculate_kdj()
         
-        # 获取最近指定天数的数据
-        analysis_data = self.data.tail(days + holding_days).copy()
-        j_values = analysis_data['J']
-        close_prices = analysis_data['Close']
+        # 获取最近指定天数的数据（直接切片底层数组，无需复制DataFrame）
+        n_rows = min(days + holding_days, len(self.data))
+        start = len(self.data) - n_rows
+        analysis_index = self.data.index[start:]
+        j_array = self.data['J'].to_numpy()[start:]
+        close_array = self.data['Close'].to_numpy()[start:]
         
         # 找出超买信号点（J值从<=100变为>100）
-        overbought_signals = (j_values > 100) & (j_values.shift(1) <= 100)
-        
-        returns_list = []
-        signal_details = []
-        
-        for i, (date, is_signal) in enumerate(overbought_signals.items()):
-            if is_signal and i + holding_days < len(analysis_data):
-                # 信号发生日的收盘价
-                entry_price = close_prices.iloc[i]
-                # holding_days后的收盘价
-                exit_price = close_prices.iloc[i + holding_days]
-                
-                # 计算收益率
-                return_rate = (exit_price - entry_price) / entry_price
-                returns_list.append(return_rate)
-                
-                signal_details.append({
-                    'signal_date': date,
-                    'entry_price': entry_price,
-                    'exit_date': analysis_data.index[i + holding_days],
-                    'exit_price': exit_price,
-                    'return_rate': return_rate,
-                    'return_pct': return_rate * 100
-                })
-        
-        if returns_list:
-            avg_return = np.mean(returns_list)
-            max_return = np.max(returns_list)
-            min_return = np.min(returns_list)
-            win_rate = sum(1 for r in returns_list if r > 0) / len(returns_list)
+        signal_mask = np.zeros(len(j_array), dtype=bool)
+        signal_mask[1:] = (j_array[1:] > 100) & (j_array[:-1] <= 100)
+        signal_idx = np.flatnonzero(signal_mask)
+        # 只保留之后有足够持有天数的信号
+        signal_idx = signal_idx[signal_idx + holding_days < n_rows]
+        exit_idx = signal_idx + holding_days
+        
+        # 信号发生日与holding_days后的收盘价，计算收益率
+        entry_prices = close_array[signal_idx]
+        exit_prices = close_array[exit_idx]
+        returns_array = (exit_prices - entry_prices) / entry_prices
+        
+        signal_details = [
+            {
+                'signal_date': signal_date,
+                'entry_price': entry_price,
+                'exit_date': exit_date,
+                'exit_price': exit_price,
+                'return_rate': return_rate,
+                'return_pct': return_rate * 100
+            }
+            for signal_date, exit_date, entry_price, exit_price, return_rate
+            in zip(analysis_index[signal_idx], analysis_index[exit_idx],
+                   entry_prices, exit_prices, returns_array)
+        ]
+        
+        if returns_array.size > 0:
+            avg_return = returns_array.mean()
+            max_return = returns_array.max()
+            min_return = returns_array.min()
+            win_rate = np.count_nonzero(returns_array > 0) / returns_array.size
         else:
             avg_return = max_return = min_return = win_rate = 0
         
         return {
-            'signal_count': len(returns_list),
+            'signal_count': int(returns_array.size),
             'avg_return': avg_return,
             'avg_return_pct': avg_return * 100,
             'max_return': max_return,
@@ -199,27 +228,30 @@ class KDJIndicator:
         if not self.kdj_data:
             self.calculate_kdj()
         
+        if self._signals is not None:
+            return self._signals
+        
         k_values = self.kdj_data['K']
         d_values = self.kdj_data['D']
         j_values = self.kdj_data['J']
         
-        # KDJ金叉：K线从下方穿越D线
-        kdj_golden_cross = (k_values > d_values) & (k_values.shift(1) <= d_values.shift(1))
-        # KDJ死叉：K线从上方穿越D线
-        kdj_death_cross = (k_values < d_values) & (k_values.shift(1) >= d_values.shift(1))
+        # KDJ金叉：K线从下方穿越D线；KDJ死叉：K线从上方穿越D线
+        kdj_golden_cross, kdj_death_cross = identify_cross_signals(k_values, d_values)
         
         # 超买超卖信号
         overbought_signal = j_values > 100  # 超买
         oversold_signal = j_values < 0      # 超卖
         
-        return {
+        self._signals = {
             'golden_cross': kdj_golden_cross,
             'death_cross': kdj_death_cross,
             'overbought': overbought_signal,
             'oversold': oversold_signal,
-            'golden_count': kdj_golden_cross.sum(),
-            'death_count': kdj_death_cross.sum()
+            'golden_count': count_signals(kdj_golden_cross),
+            'death_count': count_signals(kdj_death_cross)
         }
+        
+        return self._signals
 
 
 class RSIIndicator:
@@ -232,8 +264,9 @@ class RSIIndicator:
         Parameters:
         data: DataFrame - 包含OHLCV数据的DataFrame
         """
-        self.data = data.copy()
-        self.close = data['Close'].values.astype(np.float64)
+        self.data = data.copy(deep=False)
+        self.close = np.ascontiguousarray(data['Close'].values, dtype=np.float64)
+        self._signals = None
         
     def calculate_rsi(self, period=None):
         """
@@ -249,10 +282,18 @@ class RSIIndicator:
             period = RSI_CONFIG['period']
         
         rsi_values = tb.RSI(self.close, timeperiod=period)
-        rsi_series = pd.Series(rsi_values, index=self.data.index)
+        self.set_rsi(rsi_values)
+        return pd.Series(rsi_values, index=self.data.index)
+    
+    def set_rsi(self, rsi_values):
+        """
+        设置RSI计算结果，并清空交易信号缓存
         
-        self.data['RSI'] = rsi_series
-        return rsi_series
+        Parameters:
+        rsi_values: ndarray - RSI值，长度与数据一致
+        """
+        self.data['RSI'] = rsi_values
+        self._signals = None
     
     def get_rsi_signals(self):
         """
@@ -264,6 +305,9 @@ class RSIIndicator:
         if 'RSI' not in self.data.columns:
             self.calculate_rsi()
         
+        if self._signals is not None:
+            return self._signals
+        
         rsi_values = self.data['RSI']
         
         # RSI超买超卖信号
@@ -272,17 +316,19 @@ class RSIIndicator:
         
         # RSI背离分析（简化版）
         # 这里实现简单的RSI趋势判断
-        rsi_bullish = (rsi_values > 50) & (rsi_values.shift(1) <= 50)  # 转强
-        rsi_bearish = (rsi_values < 50) & (rsi_values.shift(1) >= 50)  # 转弱
+        # 上穿50为转强，下穿50为转弱
+        rsi_bullish, rsi_bearish = identify_cross_signals(rsi_values, 50)
         
-        return {
+        self._signals = {
             'overbought': rsi_overbought,
             'oversold': rsi_oversold,
             'bullish_signal': rsi_bullish,
             'bearish_signal': rsi_bearish,
-            'overbought_count': rsi_overbought.sum(),
-            'oversold_count': rsi_oversold.sum()
+            'overbought_count': count_signals(rsi_overbought),
+            'oversold_count': count_signals(rsi_oversold)
         }
+        
+        return self._signals
 
 
 class KDJRSIComparator:
@@ -295,7 +341,8 @@ class KDJRSIComparator:
         Parameters:
         data: DataFrame - 包含OHLCV数据的DataFrame
         """
-        self.data = data.copy()
+        # 各指标对象均为浅拷贝，只新增指标列，OHLCV列与原数据共享内存
+        self.data = data.copy(deep=False)
         self.kdj = KDJIndicator(data)
         self.rsi = RSIIndicator(data)
         
@@ -307,12 +354,26 @@ class KDJRSIComparator:
         # 计算RSI
         self.rsi.calculate_rsi()
         
-        # 合并数据
+        self._merge_indicators()
+        return self.data
+    
+    def set_indicators(self, k_values, d_values, j_values, rsi_values):
+        """
+        设置已计算好的KDJ和RSI结果（各指标对象的缓存随之清空），并合并到数据中
+        
+        Parameters:
+        k_values, d_values, j_values: ndarray - K、D、J值，长度与数据一致
+        rsi_values: ndarray - RSI值，长度与数据一致
+        """
+        self.kdj.set_kdj(k_values, d_values, j_values)
+        self.rsi.set_rsi(rsi_values)
+        self._merge_indicators()
+    
+    def _merge_indicators(self):
+        """将KDJ和RSI合并到数据中"""
         for key, series in self.kdj.kdj_data.items():
             self.data[key] = series
         self.data['RSI'] = self.rsi.data['RSI']
-        
-        return self.data
     
     def compare_signals(self):
         """
@@ -335,8 +396,8 @@ class KDJRSIComparator:
             'rsi_signals': rsi_signals,
             'overbought_agree': overbought_agree,
             'oversold_agree': oversold_agree,
-            'overbought_agree_count': overbought_agree.sum(),
-            'oversold_agree_count': oversold_agree.sum()
+            'overbought_agree_count': count_signals(overbought_agree),
+            'oversold_agree_count': count_signals(oversold_agree)
         }
         
         return comparison_result
@@ -9,10 +9,13 @@ import talib as tb
 import sys
 import os
 
-# 添加父目录到Python路径
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# 添加父目录到Python路径（已在路径中时不再重复添加）
+_src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if _src_dir not in sys.path:
+    sys.path.append(_src_dir)
 from utils.config import MA_PERIODS
-from utils.helpers import identify_cross_signals, count_signals
+from utils.helpers import append_columns, check_bar_date
+from utils.kernels import NUMBA_AVAILABLE, all_sma, all_ema, scan_cross_pairs
 
 
 class MovingAverageSystem:
@@ -25,10 +28,13 @@ class MovingAverageSystem:
         Parameters:
         data: DataFrame - 包含OHLCV数据的DataFrame
         """
-        self.data = data.copy()
-        self.close = data['Close'].values.astype(np.float64)
-        self.ma_data = {}  # 存储计算的均线数据
+        self.data = data.copy(deep=False)
+        self.close = np.ascontiguousarray(data['Close'].values, dtype=np.float64)
+        self.ma_data = {}  # 存储计算的均线数据（ma_matrix各列的Series视图）
+        self.ma_names = []  # 均线名称，对应ma_matrix的各列
+        self.ma_matrix = None  # (K线数, 均线数)的均线矩阵，均线数据的主存储
         self.signals = {}  # 存储交易信号
+        self._ma_state = None  # 增量更新用的递推状态，首次update时初始化
         
     def calculate_sma(self, periods=None):
         """
@@ -43,13 +49,31 @@ class MovingAverageSystem:
         if periods is None:
             periods = MA_PERIODS['sma']
         
+        sma_matrix = self._calculate_sma_matrix(periods)
         sma_results = {}
-        for period in periods:
-            sma_values = tb.SMA(self.close, timeperiod=period)
-            sma_results[f'SMA_{period}'] = pd.Series(sma_values, index=self.data.index)
+        for j, period in enumerate(periods):
+            sma_results[f'SMA_{period}'] = pd.Series(sma_matrix[j], index=self.data.index)
             
         return sma_results
     
+    def _calculate_sma_matrix(self, periods):
+        """
+        一次遍历收盘价计算全部周期的SMA
+        
+        Parameters:
+        periods: list - 均线周期列表
+        
+        Returns:
+        ndarray - (周期数, K线数)的SMA矩阵
+        """
+        if NUMBA_AVAILABLE:
+            return all_sma(self.close, np.asarray(periods, dtype=np.int64))
+        
+        sma_matrix = np.empty((len(periods), len(self.close)))
+        for j, period in enumerate(periods):
+            sma_matrix[j] = tb.SMA(self.close, timeperiod=period)
+        return sma_matrix
+    
     def calculate_ema(self, periods=None):
         """
         计算指数移动平均线(EMA)
@@ -63,29 +87,151 @@ class MovingAverageSystem:
         if periods is None:
             periods = MA_PERIODS['ema']
         
+        ema_matrix = self._calculate_ema_matrix(periods)
         ema_results = {}
-        for period in periods:
-            ema_values = tb.EMA(self.close, timeperiod=period)
-            ema_results[f'EMA_{period}'] = pd.Series(ema_values, index=self.data.index)
+        for j, period in enumerate(periods):
+            ema_results[f'EMA_{period}'] = pd.Series(ema_matrix[j], index=self.data.index)
             
         return ema_results
     
+    def _calculate_ema_matrix(self, periods):
+        """
+        一次遍历收盘价计算全部周期的EMA
+        
+        Parameters:
+        periods: list - 均线周期列表
+        
+        Returns:
+        ndarray - (周期数, K线数)的EMA矩阵
+        """
+        if NUMBA_AVAILABLE:
+            return all_ema(self.close, np.asarray(periods, dtype=np.int64))
+        
+        ema_matrix = np.empty((len(periods), len(self.close)))
+        for j, period in enumerate(periods):
+            ema_matrix[j] = tb.EMA(self.close, timeperiod=period)
+        return ema_matrix
+    
     def calculate_all_ma(self):
         """计算所有移动平均线"""
+        sma_periods = MA_PERIODS['sma']
+        ema_periods = MA_PERIODS['ema']
+        ma_names = [f'SMA_{p}' for p in sma_periods] + [f'EMA_{p}' for p in ema_periods]
+        
+        # 按行填充后转置，矩阵的每一列在内存中连续
+        ma_rows = np.empty((len(ma_names), len(self.close)))
+        
         # 计算SMA
-        sma_results = self.calculate_sma()
-        self.ma_data.update(sma_results)
+        ma_rows[:len(sma_periods)] = self._calculate_sma_matrix(sma_periods)
         
         # 计算EMA
-        ema_results = self.calculate_ema()
-        self.ma_data.update(ema_results)
-        
-        # 将结果添加到数据中
-        for ma_name, ma_series in self.ma_data.items():
-            self.data[ma_name] = ma_series
+        ma_rows[len(sma_periods):] = self._calculate_ema_matrix(ema_periods)
         
+        self.set_ma_matrix(ma_names, ma_rows.T)
         return self.ma_data
     
+    def set_ma_matrix(self, ma_names, ma_matrix):
+        """
+        设置均线矩阵，并同步字典视图和数据列
+        
+        Parameters:
+        ma_names: list - 均线名称，依次对应矩阵各列
+        ma_matrix: ndarray - (K线数, 均线数)的均线矩阵
+        """
+        self.ma_names = list(ma_names)
+        self.ma_matrix = ma_matrix
+        self.ma_data = {
+            name: pd.Series(ma_matrix[:, j], index=self.data.index)
+            for j, name in enumerate(self.ma_names)
+        }
+        
+        # 将结果一次性添加到数据中
+        self.data = append_columns(
+            self.data, pd.DataFrame(ma_matrix, index=self.data.index, columns=self.ma_names)
+        )
+        
+        # 均线已更新，交叉信号需重新识别，递推状态需重新初始化
+        self.signals.pop('cross_signals', None)
+        self._ma_state = None
+    
+    def _init_ma_state(self, n=None):
+        """
+        根据已有收盘价和均线矩阵初始化各均线的递推状态
+        SMA记录最近period-1根K线的收盘价之和，EMA记录最新的均线值
+        
+        Parameters:
+        n: int - 只使用前n根K线（修正最后一根K线时取上一根K线的状态），默认使用全部K线
+        """
+        if n is None:
+            n = len(self.close)
+        state = []
+        for j, ma_name in enumerate(self.ma_names):
+            ma_type, period = ma_name.split('_')
+            period = int(period)
+            if ma_type == 'SMA':
+                value = self.close[max(n - period + 1, 0):n].sum()
+            else:
+                value = self.ma_matrix[n - 1, j] if n > 0 else np.nan
+            state.append([ma_type, period, value])
+        return state
+    
+    def update(self, bar):
+        """
+        追加一根新K线并增量更新全部均线
+        
+        均线数值按递推状态O(1)计算，无需重新计算整个序列；但追加K线时收盘价数组、
+        均线矩阵和数据表都会整体复制，单次调用仍为O(N)，逐根回放N根K线总计O(N²)
+        
+        Parameters:
+        bar: Series - 新K线数据，索引包含'Close'等OHLCV列，name为K线日期；
+                      与最后一根K线日期相同时视为修正最后一根K线（如盘中更新当日K线），否则追加
+        
+        Returns:
+        dict - 新K线上各均线的数值
+        """
+        # 先检查日期，再修改任何状态，出错时对象保持不变
+        check_bar_date(self.data.index, bar.name)
+        
+        if self.ma_matrix is None:
+            self.calculate_all_ma()
+        replace_last = len(self.data.index) > 0 and bar.name == self.data.index[-1]
+        
+        # 修正最后一根K线时，递推状态回退到上一根K线
+        n_prev = len(self.close) - 1 if replace_last else len(self.close)
+        if replace_last or self._ma_state is None:
+            state = self._init_ma_state(n_prev)
+        else:
+            state = self._ma_state
+        
+        close = float(bar['Close'])
+        close_arr = np.append(self.close[:n_prev], close)
+        n = len(close_arr)
+        
+        new_values = np.empty(len(self.ma_names))
+        for j, (ma_type, period, value) in enumerate(state):
+            if ma_type == 'SMA':
+                # 先加入新值、输出、再减去窗口首值，与全量计算的运算顺序一致
+                value += close
+                new_values[j] = value / period if n >= period else np.nan
+                if n >= period:
+                    value -= close_arr[n - period]
+            elif n < period:
+                new_values[j] = value = np.nan
+            elif n == period:
+                # 第一个EMA值为前period根K线的简单平均
+                new_values[j] = value = close_arr[:period].sum() / period
+            else:
+                new_values[j] = value = (close - value) * (2.0 / (period + 1)) + value
+            state[j][2] = value
+        
+        # 追加（或替换）最后一根K线，并把新的均线值接到均线矩阵末尾
+        self.close = close_arr
+        self.data.loc[bar.name] = bar
+        self.set_ma_matrix(self.ma_names, np.vstack([self.ma_matrix[:n_prev], new_values]))
+        self._ma_state = state
+        
+        return dict(zip(self.ma_names, new_values))
+    
     def identify_ma_cross_signals(self):
         """
         识别均线金叉死叉信号
@@ -93,12 +239,16 @@ class MovingAverageSystem:
         Returns:
         dict - 包含各种均线交叉信号的字典
         """
-        cross_signals = {}
-        
         # 确保均线已计算
         if not self.ma_data:
             self.calculate_all_ma()
         
+        # 均线未变化时直接复用上次的识别结果
+        if 'cross_signals' in self.signals:
+            return self.signals['cross_signals']
+        
+        cross_signals = {}
+        
         # 定义需要分析的均线对
         cross_pairs = [
             ('SMA_5', 'SMA_10'),   # 5日与10日均线
@@ -108,20 +258,40 @@ class MovingAverageSystem:
             ('EMA_12', 'EMA_26'),  # 12日与26日EMA
         ]
         
-        for fast_ma, slow_ma in cross_pairs:
-            if fast_ma in self.ma_data and slow_ma in self.ma_data:
-                fast_line = self.ma_data[fast_ma]
-                slow_line = self.ma_data[slow_ma]
-                
-                golden_cross, death_cross = identify_cross_signals(fast_line, slow_line)
-                
-                pair_name = f"{fast_ma}_{slow_ma}"
-                cross_signals[pair_name] = {
-                    'golden_cross': golden_cross,
-                    'death_cross': death_cross,
-                    'golden_count': count_signals(golden_cross),
-                    'death_count': count_signals(death_cross)
-                }
+        cross_pairs = [(fast_ma, slow_ma) for fast_ma, slow_ma in cross_pairs
+                       if fast_ma in self.ma_data and slow_ma in self.ma_data]
+        
+        if not cross_pairs:
+            self.signals['cross_signals'] = cross_signals
+            return cross_signals
+        
+        # 直接在均线矩阵上一次性处理所有组合
+        if self.ma_matrix is None:
+            self.set_ma_matrix(list(self.ma_data.keys()),
+                               np.column_stack(list(self.ma_data.values())).astype(np.float64, copy=False))
+        pair_idx = np.array([(self.ma_names.index(fast_ma), self.ma_names.index(slow_ma))
+                             for fast_ma, slow_ma in cross_pairs], dtype=np.int64)
+        
+        if NUMBA_AVAILABLE:
+            # 并行扫描，每个组合一次遍历
+            golden, death, counts = scan_cross_pairs(self.ma_matrix, pair_idx)
+        else:
+            # 按列索引一次取出全部组合的快慢线差值（K线数 × 组合数），整体向量化比较
+            diff = (self.ma_matrix[:, pair_idx[:, 0]] - self.ma_matrix[:, pair_idx[:, 1]]).T
+            golden = np.zeros(diff.shape, dtype=bool)
+            death = np.zeros(diff.shape, dtype=bool)
+            golden[:, 1:] = (diff[:, 1:] > 0) & (diff[:, :-1] <= 0)
+            death[:, 1:] = (diff[:, 1:] < 0) & (diff[:, :-1] >= 0)
+            counts = np.column_stack((np.count_nonzero(golden, axis=1), np.count_nonzero(death, axis=1)))
+        
+        for p, (fast_ma, slow_ma) in enumerate(cross_pairs):
+            pair_name = f"{fast_ma}_{slow_ma}"
+            cross_signals[pair_name] = {
+                'golden_cross': pd.Series(golden[p], index=self.data.index),
+                'death_cross': pd.Series(death[p], index=self.data.index),
+                'golden_count': int(counts[p, 0]),
+                'death_count': int(counts[p, 1])
+            }
         
         self.signals['cross_signals'] = cross_signals
         return cross_signals
@@ -136,18 +306,21 @@ class MovingAverageSystem:
         if 'cross_signals' not in self.signals:
             self.identify_ma_cross_signals()
         
-        stats_data = []
-        for pair_name, signals in self.signals['cross_signals'].items():
-            stats_data.append({
-                '均线组合': pair_name,
-                '金叉次数': signals['golden_count'],
-                '死叉次数': signals['death_count'],
-                '总交叉次数': signals['golden_count'] + signals['death_count'],
-                '数据天数': len(self.data),
-                '平均交叉间隔(天)': len(self.data) / max(1, signals['golden_count'] + signals['death_count'])
-            })
-        
-        stats_df = pd.DataFrame(stats_data)
+        # 按列构建定类型数组，一次性组装DataFrame，无需逐行推断类型
+        cross_signals = self.signals['cross_signals']
+        golden_counts = np.array([signals['golden_count'] for signals in cross_signals.values()], dtype=np.int64)
+        death_counts = np.array([signals['death_count'] for signals in cross_signals.values()], dtype=np.int64)
+        total_counts = golden_counts + death_counts
+        days = len(self.data)
+        
+        stats_df = pd.DataFrame({
+            '均线组合': list(cross_signals.keys()),
+            '金叉次数': golden_counts,
+            '死叉次数': death_counts,
+            '总交叉次数': total_counts,
+            '数据天数': np.full(len(total_counts), days, dtype=np.int64),
+            '平均交叉间隔(天)': days / np.maximum(1, total_counts)
+        })
         return stats_df
     
     def get_latest_ma_values(self):
@@ -162,7 +335,9 @@ class MovingAverageSystem:
         
         latest_values = {}
         for ma_name, ma_series in self.ma_data.items():
-            latest_values[ma_name] = ma_series.iloc[-1] if not ma_series.isna().iloc[-1] else None
+            # 只读取最后一个值判断缺失，不为整条序列生成isna()布尔序列
+            last_value = ma_series.values[-1]
+            latest_values[ma_name] = None if np.isnan(last_value) else last_value
         
         return latest_values
     
@@ -176,26 +351,35 @@ class MovingAverageSystem:
         if not self.ma_data:
             self.calculate_all_ma()
         
-        trend_analysis = {}
-        current_price = self.data['Close'].iloc[-1]
+        if self.ma_matrix is None:
+            self.set_ma_matrix(list(self.ma_data.keys()),
+                               np.column_stack(list(self.ma_data.values())).astype(np.float64, copy=False))
         
-        # 分析价格与各均线的关系
-        price_vs_ma = {}
-        for ma_name, ma_series in self.ma_data.items():
-            latest_ma = ma_series.iloc[-1]
-            if not np.isnan(latest_ma):
-                price_vs_ma[ma_name] = {
-                    'value': latest_ma,
-                    'above_ma': current_price > latest_ma,
-                    'difference_pct': ((current_price - latest_ma) / latest_ma) * 100
-                }
+        trend_analysis = {}
+        current_price = self.close[-1]
+        
+        # 分析价格与各均线的关系：对均线矩阵最后一行整体比较
+        latest_ma = self.ma_matrix[-1]
+        valid = ~np.isnan(latest_ma)
+        above_ma = current_price > latest_ma
+        with np.errstate(divide='ignore', invalid='ignore'):
+            difference_pct = ((current_price - latest_ma) / latest_ma) * 100
+        
+        price_vs_ma = {
+            ma_name: {
+                'value': latest_ma[j],
+                'above_ma': above_ma[j],
+                'difference_pct': difference_pct[j]
+            }
+            for j, ma_name in enumerate(self.ma_names) if valid[j]
+        }
         
         trend_analysis['price_vs_ma'] = price_vs_ma
         trend_analysis['current_price'] = current_price
         
         # 判断整体趋势
-        above_count = sum(1 for info in price_vs_ma.values() if info['above_ma'])
-        total_count = len(price_vs_ma)
+        above_count = int(np.count_nonzero(above_ma & valid))
+        total_count = int(np.count_nonzero(valid))
         
         if above_count >= total_count * 0.7:
             trend_analysis['overall_trend'] = '多头排列'
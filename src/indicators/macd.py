@@ -9,10 +9,14 @@ import talib as tb
 import sys
 import os
 
-# 添加父目录到Python路径
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# 添加父目录到Python路径（已在路径中时不再重复添加）
+_src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if _src_dir not in sys.path:
+    sys.path.append(_src_dir)
 from utils.config import MACD_CONFIG
-from utils.helpers import identify_cross_signals, count_signals
+from utils.helpers import (identify_cross_signals, count_signals, calculate_ema, append_columns, split_histogram,
+                           check_bar_date)
+from utils.kernels import NUMBA_AVAILABLE, macd_ewm
 
 
 class MACDIndicator:
@@ -25,9 +29,14 @@ class MACDIndicator:
         Parameters:
         data: DataFrame - 包含OHLCV数据的DataFrame
         """
-        self.data = data.copy()
-        self.close = data['Close'].values.astype(np.float64)
+        self.data = data.copy(deep=False)
+        self.close = np.ascontiguousarray(data['Close'].values, dtype=np.float64)
+        self._close_series = pd.Series(self.close, index=self.data.index, copy=False)
         self.macd_data = {}
+        self._signals = None
+        self._macd_periods = (MACD_CONFIG['fast_period'], MACD_CONFIG['slow_period'],
+                              MACD_CONFIG['signal_period'])
+        self._macd_state = None  # 增量更新用的上一根和最后一根K线的(快线EMA, 慢线EMA, 信号线)，首次update时初始化
         
     def calculate_macd(self, fast_period=None, slow_period=None, signal_period=None):
         """
@@ -56,17 +65,112 @@ class MACDIndicator:
             signalperiod=signal_period
         )
         
+        self.set_macd(macd_line, signal_line, histogram, (fast_period, slow_period, signal_period))
+        return self.macd_data
+    
+    def set_macd(self, macd_line, signal_line, histogram, periods=None):
+        """
+        设置MACD计算结果，并同步数据列、清空交易信号缓存和递推状态
+        
+        Parameters:
+        macd_line, signal_line, histogram: ndarray - MACD线、信号线和柱状图，长度与数据一致
+        periods: tuple - 计算所用的(快线周期, 慢线周期, 信号线周期)，默认使用配置中的参数
+        """
+        if periods is None:
+            periods = (MACD_CONFIG['fast_period'], MACD_CONFIG['slow_period'], MACD_CONFIG['signal_period'])
+        
         self.macd_data = {
             'MACD': pd.Series(macd_line, index=self.data.index),
             'Signal': pd.Series(signal_line, index=self.data.index),
             'Histogram': pd.Series(histogram, index=self.data.index)
         }
         
-        # 添加到原数据中
-        for key, series in self.macd_data.items():
-            self.data[key] = series
+        # 一次性添加到原数据中（直接使用数组，索引相同无需按索引对齐）
+        self.data = append_columns(self.data, pd.DataFrame(
+            dict(zip(self.macd_data, (macd_line, signal_line, histogram))), index=self.data.index
+        ))
         
-        return self.macd_data
+        # 指标已更新，交易信号需重新识别，递推状态需重新初始化
+        self._signals = None
+        self._macd_periods = tuple(periods)
+        self._macd_state = None
+    
+    def update(self, bar):
+        """
+        追加一根新K线并递推更新MACD
+        
+        MACD数值按快慢线EMA和信号线的递推状态O(1)计算，无需重新计算整个序列；
+        但追加K线时收盘价数组、各指标序列和数据表都会整体复制，单次调用仍为O(N)
+        
+        Parameters:
+        bar: Series - 新K线数据，索引包含'Close'等OHLCV列，name为K线日期；
+                      与最后一根K线日期相同时视为修正最后一根K线（如盘中更新当日K线），否则追加
+        
+        Returns:
+        dict - 新K线的MACD、Signal、Histogram值，以及是否出现金叉/死叉
+        """
+        # 先检查日期，再修改任何状态，出错时对象保持不变
+        check_bar_date(self.data.index, bar.name)
+        
+        if not self.macd_data:
+            self.calculate_macd()
+        fast_period, slow_period, signal_period = self._macd_periods
+        replace_last = len(self.data.index) > 0 and bar.name == self.data.index[-1]
+        
+        signal_values = self.macd_data['Signal'].values
+        if self._macd_state is None and not np.isnan(signal_values[-1]):
+            # 快慢线EMA不在结果中保存，初始化时各计算一次，保留最后两根K线的状态；
+            # TA-Lib的MACD中快线与慢线从同一根K线开始输出，快线EMA的起点相应后移
+            ema_fast = tb.EMA(self.close[max(slow_period - fast_period, 0):], timeperiod=fast_period)
+            ema_slow = tb.EMA(self.close, timeperiod=slow_period)
+            has_prev = len(signal_values) > 1 and not np.isnan(signal_values[-2])
+            self._macd_state = (
+                (ema_fast[-2], ema_slow[-2], signal_values[-2]) if has_prev else None,
+                (ema_fast[-1], ema_slow[-1], signal_values[-1])
+            )
+        
+        # 修正最后一根K线时，以上一根K线的状态递推，并与上一根K线的柱状图比较交叉
+        histogram_values = self.macd_data['Histogram'].values
+        n_prev = len(self.close) - 1 if replace_last else len(self.close)
+        prev_histogram = histogram_values[n_prev - 1] if n_prev > 0 else np.nan
+        base = None
+        if self._macd_state is not None:
+            base = self._macd_state[0] if replace_last else self._macd_state[1]
+        
+        close = float(bar['Close'])
+        self.close = np.append(self.close[:n_prev], close)
+        self.data.loc[bar.name] = bar
+        self._close_series = pd.Series(self.close, index=self.data.index, copy=False)
+        
+        if base is None:
+            # 信号线尚未形成（数据不足），直接全量重新计算
+            self.calculate_macd(fast_period, slow_period, signal_period)
+        else:
+            ema_fast, ema_slow, signal = base
+            ema_fast = (close - ema_fast) * (2.0 / (fast_period + 1)) + ema_fast
+            ema_slow = (close - ema_slow) * (2.0 / (slow_period + 1)) + ema_slow
+            macd_value = ema_fast - ema_slow
+            signal = (macd_value - signal) * (2.0 / (signal_period + 1)) + signal
+            new_values = (macd_value, signal, macd_value - signal)
+            
+            self.macd_data = {
+                key: pd.Series(np.append(series.values[:n_prev], value), index=self.data.index)
+                for (key, series), value in zip(self.macd_data.items(), new_values)
+            }
+            for key, series in self.macd_data.items():
+                self.data[key] = series.values
+            self._signals = None
+            self._macd_state = (base, (ema_fast, ema_slow, signal))
+        
+        histogram = self.macd_data['Histogram'].values[-1]
+        return {
+            'MACD': self.macd_data['MACD'].values[-1],
+            'Signal': self.macd_data['Signal'].values[-1],
+            'Histogram': histogram,
+            # 柱状图由负转正即MACD上穿信号线（金叉），由正转负即下穿（死叉）
+            'golden_cross': histogram > 0 and prev_histogram <= 0,
+            'death_cross': histogram < 0 and prev_histogram >= 0
+        }
     
     def calculate_macd_manual(self, fast_period=None, slow_period=None, signal_period=None):
         """
@@ -87,17 +191,25 @@ class MACDIndicator:
         if signal_period is None:
             signal_period = MACD_CONFIG['signal_period']
         
-        close_series = pd.Series(self.close, index=self.data.index)
+        if NUMBA_AVAILABLE and not np.isnan(self.close).any():
+            # 快慢EMA、MACD线、信号线和柱状图在同一次遍历中递推
+            index = self._close_series.index
+            names = ['EMA_Fast', 'EMA_Slow', 'MACD_Manual', 'Signal_Manual', 'Histogram_Manual']
+            outputs = macd_ewm(
+                self.close,
+                2.0 / (fast_period + 1.0), 2.0 / (slow_period + 1.0), 2.0 / (signal_period + 1.0)
+            )
+            return {name: pd.Series(values, index=index) for name, values in zip(names, outputs)}
         
         # 计算快慢EMA
-        ema_fast = close_series.ewm(span=fast_period, adjust=False).mean()
-        ema_slow = close_series.ewm(span=slow_period, adjust=False).mean()
+        ema_fast = calculate_ema(self._close_series, fast_period)
+        ema_slow = calculate_ema(self._close_series, slow_period)
         
         # MACD线（DIF）= EMA12 - EMA26
         macd_line = ema_fast - ema_slow
         
         # 信号线（DEA）= MACD的9日EMA
-        signal_line = macd_line.ewm(span=signal_period, adjust=False).mean()
+        signal_line = calculate_ema(macd_line, signal_period)
         
         # 柱状图（MACD）= MACD线 - 信号线
         histogram = macd_line - signal_line
@@ -122,30 +234,22 @@ class MACDIndicator:
         if not self.macd_data:
             self.calculate_macd()
         
+        if self._signals is not None:
+            return self._signals
+        
         macd_line = self.macd_data['MACD']
-        signal_line = self.macd_data['Signal']
         histogram = self.macd_data['Histogram']
         
-        # MACD金叉死叉信号
-        golden_cross, death_cross = identify_cross_signals(macd_line, signal_line)
-        
-        # MACD零轴穿越
-        # 上穿零轴（从负变正）
-        zero_cross_up = (macd_line > 0) & (macd_line.shift(1) <= 0)
-        # 下穿零轴（从正变负）
-        zero_cross_down = (macd_line < 0) & (macd_line.shift(1) >= 0)
+        # 柱状图信号：柱状图由负转正、由正转负
+        hist_turn_positive, hist_turn_negative = identify_cross_signals(histogram, 0)
         
-        # 柱状图信号
-        # 柱状图由负转正
-        hist_turn_positive = (histogram > 0) & (histogram.shift(1) <= 0)
-        # 柱状图由正转负
-        hist_turn_negative = (histogram < 0) & (histogram.shift(1) >= 0)
+        # MACD金叉死叉信号：柱状图即MACD线与信号线之差，两线交叉与柱状图穿越零轴完全等价，直接复用
+        golden_cross, death_cross = hist_turn_positive, hist_turn_negative
         
-        # 背离信号（简化版）
-        # 这里实现简单的背离检测
-        price_series = pd.Series(self.close, index=self.data.index)
+        # MACD零轴穿越：上穿零轴（从负变正）、下穿零轴（从正变负）
+        zero_cross_up, zero_cross_down = identify_cross_signals(macd_line, 0)
         
-        signals = {
+        self._signals = {
             'golden_cross': golden_cross,
             'death_cross': death_cross,
             'zero_cross_up': zero_cross_up,
@@ -158,7 +262,7 @@ class MACDIndicator:
             'zero_down_count': count_signals(zero_cross_down)
         }
         
-        return signals
+        return self._signals
     
     def get_macd_trend_analysis(self):
         """
@@ -170,14 +274,13 @@ class MACDIndicator:
         if not self.macd_data:
             self.calculate_macd()
         
-        macd_line = self.macd_data['MACD']
-        signal_line = self.macd_data['Signal']
-        histogram = self.macd_data['Histogram']
+        # 只需要最新的几个值，直接从底层数组取值
+        histogram = self.macd_data['Histogram'].values
         
         # 获取最新值
-        latest_macd = macd_line.iloc[-1]
-        latest_signal = signal_line.iloc[-1]
-        latest_histogram = histogram.iloc[-1]
+        latest_macd = self.macd_data['MACD'].values[-1]
+        latest_signal = self.macd_data['Signal'].values[-1]
+        latest_histogram = histogram[-1]
         
         # 趋势判断
         if latest_macd > latest_signal and latest_macd > 0:
@@ -190,9 +293,9 @@ class MACDIndicator:
             trend = '强势回调'
         
         # 动量判断
-        if latest_histogram > histogram.iloc[-2]:
+        if latest_histogram > histogram[-2]:
             momentum = '动量增强'
-        elif latest_histogram < histogram.iloc[-2]:
+        elif latest_histogram < histogram[-2]:
             momentum = '动量减弱'
         else:
             momentum = '动量持平'
@@ -220,11 +323,7 @@ class MACDIndicator:
         histogram = self.macd_data['Histogram']
         
         # 分离正负柱状图
-        histogram_positive = histogram.copy()
-        histogram_positive[histogram_positive < 0] = np.nan
-        
-        histogram_negative = histogram.copy()
-        histogram_negative[histogram_negative >= 0] = np.nan
+        histogram_positive, histogram_negative = split_histogram(histogram)
         
         plot_data = {
             'MACD': self.macd_data['MACD'],
@@ -245,9 +344,9 @@ class MACDIndicator:
         trend_analysis = self.get_macd_trend_analysis()
         signals = self.identify_macd_signals()
         
-        # 检查最近是否有信号
-        recent_golden = signals['golden_cross'].tail(5).any()
-        recent_death = signals['death_cross'].tail(5).any()
+        # 检查最近是否有信号（直接对底层数组切片）
+        recent_golden = signals['golden_cross'].values[-5:].any()
+        recent_death = signals['death_cross'].values[-5:].any()
         
         status = {
             'current_values': {
@@ -0,0 +1,212 @@
+"""
+指标流水线模块 - 一次性计算全部技术指标，供各作业任务共享
+避免每个任务各自复制数据、重复遍历收盘价序列
+"""
+
+import pandas as pd
+import numpy as np
+import talib as tb
+import sys
+import os
+
+# 添加父目录到Python路径（已在路径中时不再重复添加）
+_src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if _src_dir not in sys.path:
+    sys.path.append(_src_dir)
+from utils.config import MA_PERIODS, BOLLINGER_CONFIG, KDJ_CONFIG, RSI_CONFIG, MACD_CONFIG
+from utils.helpers import to_ohlcv_arrays
+from utils.kernels import NUMBA_AVAILABLE, all_sma, all_ema, bbands, stoch_kdj, batch_indicators
+from .ma_system import MovingAverageSystem
+from .bollinger import BollingerBands
+from .kdj_rsi import KDJRSIComparator
+from .macd import MACDIndicator
+
+
+def calculate_indicator_arrays(ohlcv):
+    """
+    基于OHLCV数组一次性计算SMA/EMA/MACD/布林带/KDJ/RSI全部指标
+
+    Parameters:
+    ohlcv: dict - to_ohlcv_arrays返回的float64数组字典
+
+    Returns:
+    dict - 指标名 -> ndarray，列名与各指标类保持一致
+    """
+    high = ohlcv['High']
+    low = ohlcv['Low']
+    close = ohlcv['Close']
+
+    columns = {}
+
+    # 移动平均线（全部SMA周期、全部EMA周期各一次遍历）
+    sma_periods = MA_PERIODS['sma']
+    ema_periods = MA_PERIODS['ema']
+    if NUMBA_AVAILABLE:
+        sma_matrix = all_sma(close, np.asarray(sma_periods, dtype=np.int64))
+        for j, period in enumerate(sma_periods):
+            columns[f'SMA_{period}'] = sma_matrix[j]
+        ema_matrix = all_ema(close, np.asarray(ema_periods, dtype=np.int64))
+        for j, period in enumerate(ema_periods):
+            columns[f'EMA_{period}'] = ema_matrix[j]
+    else:
+        for period in sma_periods:
+            columns[f'SMA_{period}'] = tb.SMA(close, timeperiod=period)
+        for period in ema_periods:
+            columns[f'EMA_{period}'] = tb.EMA(close, timeperiod=period)
+
+    # MACD
+    columns['MACD'], columns['Signal'], columns['Histogram'] = tb.MACD(
+        close,
+        fastperiod=MACD_CONFIG['fast_period'],
+        slowperiod=MACD_CONFIG['slow_period'],
+        signalperiod=MACD_CONFIG['signal_period']
+    )
+
+    # 布林带（含宽度和%B）
+    period = BOLLINGER_CONFIG['period']
+    std_dev = BOLLINGER_CONFIG['std_dev']
+    if NUMBA_AVAILABLE:
+        upper, middle, lower, width, percent_b = bbands(close, period, float(std_dev))
+    else:
+        upper, middle, lower = tb.BBANDS(
+            close, timeperiod=period, nbdevup=std_dev, nbdevdn=std_dev, matype=0
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            width = (upper - lower) / middle
+            percent_b = (close - lower) / (upper - lower)
+    columns['BB_Upper'] = upper
+    columns['BB_Middle'] = middle
+    columns['BB_Lower'] = lower
+    columns['BB_Width'] = width
+    columns['Percent_B'] = percent_b
+
+    # KDJ
+    fastk_period = KDJ_CONFIG['fastk_period']
+    slowk_period = KDJ_CONFIG['slowk_period']
+    slowd_period = KDJ_CONFIG['slowd_period']
+    if NUMBA_AVAILABLE:
+        k_values, d_values, j_values = stoch_kdj(
+            high, low, close, fastk_period, slowk_period, slowd_period
+        )
+    else:
+        k_values, d_values = tb.STOCH(
+            high, low, close,
+            fastk_period=fastk_period,
+            slowk_period=slowk_period, slowk_matype=0,
+            slowd_period=slowd_period, slowd_matype=0
+        )
+        j_values = 3 * k_values - 2 * d_values
+    columns['K'] = k_values
+    columns['D'] = d_values
+    columns['J'] = j_values
+
+    # RSI
+    columns['RSI'] = tb.RSI(close, timeperiod=RSI_CONFIG['period'])
+
+    return columns
+
+
+def compute_all_indicators(data, ohlcv=None):
+    """
+    一次性计算全部指标，仅在最后组装为DataFrame
+
+    Parameters:
+    data: DataFrame - 包含OHLCV数据的DataFrame
+    ohlcv: dict - 已缓存的OHLCV数组，为None时从data提取
+
+    Returns:
+    DataFrame - 与data索引一致的指标表
+    """
+    if ohlcv is None:
+        ohlcv = to_ohlcv_arrays(data)
+    return pd.DataFrame(calculate_indicator_arrays(ohlcv), index=data.index)
+
+
+def compute_batch_indicators(data_dict):
+    """
+    批量计算多只股票的KDJ、RSI和布林带（K线数相同的股票合并为矩阵，按股票并行计算）
+    
+    Parameters:
+    data_dict: dict - 股票代码 -> 包含OHLCV数据的DataFrame
+    
+    Returns:
+    dict - 股票代码 -> 指标DataFrame，列为K、D、J、RSI、BB_Upper、BB_Middle、BB_Lower
+    """
+    columns = ['K', 'D', 'J', 'RSI', 'BB_Upper', 'BB_Middle', 'BB_Lower']
+    results = {}
+    
+    if not NUMBA_AVAILABLE:
+        # 逐只股票使用TA-Lib计算
+        for code, data in data_dict.items():
+            indicator_arrays = calculate_indicator_arrays(to_ohlcv_arrays(data))
+            results[code] = pd.DataFrame({name: indicator_arrays[name] for name in columns}, index=data.index)
+        return results
+    
+    # 按K线数分组，同组股票堆叠为(股票数, K线数)矩阵
+    groups = {}
+    for code, data in data_dict.items():
+        groups.setdefault(len(data), []).append(code)
+    
+    for codes in groups.values():
+        high, low, close = (
+            np.vstack([np.asarray(data_dict[code][col], dtype=np.float64) for code in codes])
+            for col in ('High', 'Low', 'Close')
+        )
+        outputs = batch_indicators(
+            high, low, close,
+            KDJ_CONFIG['fastk_period'], KDJ_CONFIG['slowk_period'], KDJ_CONFIG['slowd_period'],
+            RSI_CONFIG['period'], BOLLINGER_CONFIG['period'], float(BOLLINGER_CONFIG['std_dev'])
+        )
+        for s, code in enumerate(codes):
+            results[code] = pd.DataFrame(
+                {name: values[s] for name, values in zip(columns, outputs)},
+                index=data_dict[code].index
+            )
+    
+    # 保持与输入相同的股票顺序
+    return {code: results[code] for code in data_dict}
+
+
+def build_indicators(data, indicator_frame=None, ohlcv=None):
+    """
+    创建已填充计算结果的各指标对象，后续分析方法无需再次计算
+
+    Parameters:
+    data: DataFrame - 包含OHLCV数据的DataFrame
+    indicator_frame: DataFrame - compute_all_indicators的结果，为None时自动计算
+    ohlcv: dict - 已缓存的OHLCV数组，为None时从data提取
+
+    Returns:
+    dict - {'ma': MovingAverageSystem, 'bollinger': BollingerBands,
+            'macd': MACDIndicator, 'kdj_rsi': KDJRSIComparator}
+    """
+    if indicator_frame is None:
+        indicator_frame = compute_all_indicators(data, ohlcv)
+
+    def _take(names):
+        return [indicator_frame[name].to_numpy(dtype=np.float64) for name in names]
+
+    # 各指标通过set_*方法写入结果，同时清空对象内依赖结果的缓存
+    # 移动平均线系统
+    ma_system = MovingAverageSystem(data)
+    ma_names = [f'SMA_{p}' for p in MA_PERIODS['sma']] + [f'EMA_{p}' for p in MA_PERIODS['ema']]
+    ma_system.set_ma_matrix(ma_names, indicator_frame[ma_names].to_numpy(dtype=np.float64))
+
+    # 布林带
+    bollinger = BollingerBands(data)
+    bollinger.set_bollinger_bands(*_take(['BB_Upper', 'BB_Middle', 'BB_Lower', 'BB_Width', 'Percent_B']))
+
+    # MACD
+    macd = MACDIndicator(data)
+    macd.set_macd(*_take(['MACD', 'Signal', 'Histogram']))
+
+    # KDJ与RSI
+    comparator = KDJRSIComparator(data)
+    comparator.set_indicators(*_take(['K', 'D', 'J', 'RSI']))
+
+    return {
+        'ma': ma_system,
+        'bollinger': bollinger,
+        'macd': macd,
+        'kdj_rsi': comparator
+    }
@@ -2,7 +2,21 @@
 工具模块
 """
 
+import importlib
+
 from .config import *
-from .helpers import *
 
 __all__ = ['config', 'helpers']
+
+
+def __getattr__(name):
+    # helpers依赖pandas，首次访问时再加载：只使用配置常量时无需导入pandas（PEP 562）
+    if name.startswith('__'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    helpers = importlib.import_module('.helpers', __name__)
+    if name == 'helpers':
+        return helpers
+    try:
+        return getattr(helpers, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
@@ -44,12 +44,20 @@ CHART_STYLE = {
     'edge_color': 'black',  # 边框颜色
     'wick_color': 'black',  # 影线颜色
     'font_family': 'SimHei', # 中文字体
-    'figure_dpi': 300       # 图片清晰度
+    'figure_dpi': 300,      # 图片清晰度
+    'draft_dpi': 100        # 草稿模式保存图片的清晰度
 }
 
 # 文件路径配置
 PATHS = {
     'data': 'data/',
     'charts': 'output/charts/',
-    'reports': 'output/reports/'
+    'reports': 'output/reports/',
+    'cache': 'data/cache/'
+}
+
+# 数据缓存配置
+CACHE_CONFIG = {
+    'enabled': True,       # 是否启用本地parquet缓存
+    'ttl_hours': 24        # 缓存有效期（小时）
 }
@@ -7,6 +7,14 @@ import numpy as np
 from datetime import datetime
 import os
 
+from .config import CHART_STYLE
+
+try:
+    import bottleneck as bn
+    BOTTLENECK_AVAILABLE = True
+except ImportError:
+    BOTTLENECK_AVAILABLE = False
+
 
 def load_tushare_token():
     """加载Tushare API Token"""
@@ -36,12 +44,15 @@ def clean_stock_data(df):
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors='coerce')
     
-    # 删除空值和重复值
-    df = df.dropna()
-    df = df.drop_duplicates()
+    # 空值和异常值（±inf）在同一个掩码中判断：数值列用isfinite一次检查，其余列检查空值
+    numeric = df.select_dtypes(include='number')
+    valid = np.isfinite(numeric.to_numpy(dtype=np.float64)).all(axis=1)
+    other_cols = df.columns.difference(numeric.columns, sort=False)
+    if len(other_cols) > 0:
+        valid &= df[other_cols].notna().all(axis=1).to_numpy()
     
-    # 删除异常值
-    df = df.replace([np.inf, -np.inf], np.nan).dropna()
+    # 删除空值、异常值和重复值
+    df = df[valid].drop_duplicates()
     
     return df
 
@@ -59,8 +70,8 @@ def format_date_for_tushare(date_str):
     if isinstance(date_str, str):
         # 移除可能的分隔符
         date_str = date_str.replace('-', '').replace('/', '')
-        # 如果已经是YYYYMMDD格式，直接返回
-        if len(date_str) == 8:
+        # 如果已经是YYYYMMDD格式，直接返回（仅数字，避免把其他8位字符串原样传给接口）
+        if len(date_str) == 8 and date_str.isdigit():
             return date_str
     
     # 其他格式转换
@@ -75,9 +86,124 @@ def format_date_for_tushare(date_str):
 
 
 def ensure_directory_exists(path):
-    """确保目录存在，如果不存在则创建"""
-    if not os.path.exists(path):
-        os.makedirs(path)
+    """确保目录存在，如果不存在则创建（空路径即当前目录，无需创建）"""
+    if path:
+        # exist_ok=True：已存在时一次系统调用即可返回，无需先单独检查
+        os.makedirs(path, exist_ok=True)
+
+
+def save_figure(fig, save_path, draft=False, close=False):
+    """
+    保存图表为图片文件
+    
+    Parameters:
+    fig: Figure - matplotlib图表对象
+    save_path: str - 保存路径
+    draft: bool - 草稿模式：使用较低分辨率且不裁剪空白边距（省去计算紧凑边界的额外渲染），
+                  适合中间结果预览；默认按正式输出的高分辨率保存
+    close: bool - 保存后关闭图表，避免批量绘图时pyplot持有全部图表导致内存持续增长
+    """
+    ensure_directory_exists(os.path.dirname(save_path))
+    if draft:
+        fig.savefig(save_path, dpi=CHART_STYLE['draft_dpi'])
+    else:
+        fig.savefig(save_path, bbox_inches='tight', dpi=CHART_STYLE['figure_dpi'])
+    
+    if close:
+        import matplotlib.pyplot as plt
+        plt.close(fig)
+
+
+def to_ohlcv_arrays(data):
+    """
+    提取OHLCV列为连续的float64数组（按列存储的SoA视图）
+    
+    Parameters:
+    data: DataFrame - 包含OHLCV数据的DataFrame
+    
+    Returns:
+    dict - {'Open', 'High', 'Low', 'Close', 'Volume'} -> ndarray
+    """
+    return {
+        col: np.ascontiguousarray(data[col].values, dtype=np.float64)
+        for col in ('Open', 'High', 'Low', 'Close', 'Volume')
+    }
+
+
+def append_columns(data, columns):
+    """
+    将多列指标一次性拼接到DataFrame，避免逐列插入时反复调整内部数据块
+    
+    Parameters:
+    data: DataFrame - 原始数据
+    columns: DataFrame - 待添加的指标列，索引与data一致
+    
+    Returns:
+    DataFrame - 添加指标列后的数据；列已存在时（如重新计算）在data上原地覆盖
+    """
+    if data.columns.intersection(columns.columns).empty:
+        return pd.concat([data, columns], axis=1)
+    
+    for name in columns.columns:
+        data[name] = columns[name].values
+    return data
+
+
+def check_bar_date(index, date):
+    """
+    检查增量更新的K线日期：只能追加新K线或修正最后一根K线
+    
+    Parameters:
+    index: DatetimeIndex - 已有数据的索引（按日期升序）
+    date: Timestamp - 新K线的日期
+    """
+    if len(index) > 0 and date < index[-1]:
+        raise ValueError(f"K线日期{date}早于最后一根K线{index[-1]}，只能追加新K线或修正最后一根K线")
+
+
+def resample_ohlcv(data, rule):
+    """
+    将日线OHLCV数据聚合为周线或月线，结果与resample(rule).agg(...).dropna()一致
+    
+    Parameters:
+    data: DataFrame - 日线数据，索引为DatetimeIndex
+    rule: str - 'W'周线（以周日为标签）或'M'月线（以月末为标签）
+    
+    Returns:
+    DataFrame - 聚合后的OHLCV数据
+    """
+    columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+    ohlcv = data[columns]
+    if not ohlcv.index.is_monotonic_increasing:
+        ohlcv = ohlcv.sort_index()
+    
+    # 含缺失值时交给pandas处理（first/last等需要跳过缺失值）
+    if len(ohlcv) == 0 or ohlcv.isna().to_numpy().any():
+        return ohlcv.resample(rule).agg({
+            'Open': 'first',
+            'High': 'max',
+            'Low': 'min',
+            'Close': 'last',
+            'Volume': 'sum'
+        }).dropna()
+    
+    # 按周期编号找出每个分组的起止位置，各列一次reduceat完成聚合
+    periods = ohlcv.index.to_period(rule)
+    codes = periods.asi8
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)] - 1
+    
+    index = periods[starts].to_timestamp(how='end').normalize()
+    index.name = ohlcv.index.name
+    
+    return pd.DataFrame({
+        'Open': ohlcv['Open'].to_numpy()[starts],
+        'High': np.maximum.reduceat(ohlcv['High'].to_numpy(), starts),
+        'Low': np.minimum.reduceat(ohlcv['Low'].to_numpy(), starts),
+        'Close': ohlcv['Close'].to_numpy()[ends],
+        # 成交量用groupby求和（带补偿求和），与resample的sum逐位一致；reduceat会有末位误差
+        'Volume': ohlcv['Volume'].groupby(codes, sort=False).sum().to_numpy()
+    }, index=index)
 
 
 def calculate_returns(prices):
@@ -93,34 +219,138 @@ def calculate_returns(prices):
     return prices.pct_change().dropna()
 
 
+def calculate_ema(series, span):
+    """
+    计算指数移动平均，结果与series.ewm(span=span, adjust=False).mean()一致
+    
+    Parameters:
+    series: Series - 输入序列
+    span: int - EMA跨度
+    
+    Returns:
+    Series - EMA序列
+    """
+    # 按需导入，避免仅使用配置和工具函数时加载numba
+    from .kernels import NUMBA_AVAILABLE, ewm_mean
+    
+    if not NUMBA_AVAILABLE:
+        return series.ewm(span=span, adjust=False).mean()
+    
+    values = np.asarray(series, dtype=np.float64)
+    return pd.Series(ewm_mean(values, 2.0 / (span + 1.0)), index=series.index)
+
+
+def calculate_sma(series, window):
+    """
+    计算滚动均值，与series.rolling(window).mean()一致（浮点误差内）
+    
+    Parameters:
+    series: Series - 输入序列
+    window: int - 窗口长度
+    
+    Returns:
+    Series - 滚动均值序列，前window-1个位置为NaN
+    """
+    if not BOTTLENECK_AVAILABLE:
+        return series.rolling(window=window).mean()
+    
+    values = np.asarray(series, dtype=np.float64)
+    return pd.Series(bn.move_mean(values, window, min_count=window), index=series.index)
+
+
+def calculate_rolling_std(series, window):
+    """
+    计算滚动样本标准差，与series.rolling(window).std()一致（浮点误差内）
+    
+    Parameters:
+    series: Series - 输入序列
+    window: int - 窗口长度
+    
+    Returns:
+    Series - 滚动标准差序列，前window-1个位置为NaN
+    """
+    if not BOTTLENECK_AVAILABLE:
+        return series.rolling(window=window).std()
+    
+    values = np.asarray(series, dtype=np.float64)
+    return pd.Series(bn.move_std(values, window, min_count=window, ddof=1), index=series.index)
+
+
 def identify_cross_signals(fast_line, slow_line):
     """
     识别金叉和死叉信号
     
     Parameters:
     fast_line: Series - 快线（短周期均线）
-    slow_line: Series - 慢线（长周期均线）
+    slow_line: Series或标量 - 慢线（长周期均线），也可以是固定阈值（如零轴）
     
     Returns:
     tuple: (golden_cross, death_cross) - 金叉信号和死叉信号的布尔序列
     """
-    # 金叉：快线从下方穿越慢线
-    golden_cross = (fast_line > slow_line) & (fast_line.shift(1) <= slow_line.shift(1))
+    # 快慢线差值，NaN参与比较时结果为False，与逐元素比较一致
+    diff = np.asarray(fast_line, dtype=np.float64) - np.asarray(slow_line, dtype=np.float64)
+    prev_diff, curr_diff = diff[:-1], diff[1:]
     
+    golden = np.zeros(diff.shape[0], dtype=bool)
+    death = np.zeros(diff.shape[0], dtype=bool)
+    # 金叉：快线从下方穿越慢线
+    golden[1:] = (curr_diff > 0) & (prev_diff <= 0)
     # 死叉：快线从上方穿越慢线
-    death_cross = (fast_line < slow_line) & (fast_line.shift(1) >= slow_line.shift(1))
+    death[1:] = (curr_diff < 0) & (prev_diff >= 0)
+    
+    golden_cross = pd.Series(golden, index=fast_line.index)
+    death_cross = pd.Series(death, index=fast_line.index)
     
     return golden_cross, death_cross
 
 
+def count_rising_edges(mask):
+    """
+    统计布尔序列从False变为True的次数（首个元素之前视为False）
+    
+    Parameters:
+    mask: ndarray - 布尔数组
+    
+    Returns:
+    int - 上升沿次数
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if mask.size == 0:
+        return 0
+    # 布尔比较 当前 > 前一个 仅在False→True时成立，一次比较即可，无需取反再相与
+    return int(mask[0]) + np.count_nonzero(mask[1:] > mask[:-1])
+
+
 def count_signals(signal_series):
     """
     统计信号出现次数
     
     Parameters:
-    signal_series: Series - 布尔类型的信号序列
+    signal_series: Series或ndarray - 布尔类型的信号序列
     
     Returns:
     int - 信号出现次数
     """
-    return signal_series.sum()
+    values = np.asarray(signal_series)
+    if values.dtype != bool:
+        # 非布尔序列（如含NaN的浮点序列）保留求和语义
+        return signal_series.sum()
+    return np.count_nonzero(values)
+
+
+def split_histogram(histogram):
+    """
+    将MACD柱状图分离为正、负两部分（另一部分及缺失值置为NaN），用于分色绘制
+    
+    Parameters:
+    histogram: Series - MACD柱状图序列
+    
+    Returns:
+    tuple: (histogram_positive, histogram_negative) - 非负部分和负值部分
+    """
+    values = histogram.values
+    histogram_positive = pd.Series(np.where(values >= 0, values, np.nan),
+                                   index=histogram.index, name=histogram.name)
+    histogram_negative = pd.Series(np.where(values < 0, values, np.nan),
+                                   index=histogram.index, name=histogram.name)
+    return histogram_positive, histogram_negative
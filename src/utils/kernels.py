@@ -0,0 +1,681 @@
+"""
+数值计算内核模块 - 基于Numba的技术指标加速内核
+
+未安装numba时，njit退化为普通Python函数，调用方可通过NUMBA_AVAILABLE
+判断是否回退到TA-Lib/pandas实现。
+串行内核（指标与统计）可通过 python src/utils/build_kernels.py 预编译为扩展模块fin_kernels，
+存在时自动替换对应的JIT入口函数。
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """numba不可用时的占位装饰器"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator
+
+
+@njit(cache=True)
+def _rolling_extreme(values, window, find_max):
+    """
+    单调双端队列求滚动极值，每根K线均摊O(1)
+
+    Parameters:
+    values: ndarray - float64序列
+    window: int - 窗口长度
+    find_max: bool - True求最大值，False求最小值
+
+    Returns:
+    ndarray - 与输入等长，前window-1个位置为NaN
+    """
+    n = values.shape[0]
+    out = np.full(n, np.nan)
+    if window <= 0:
+        return out
+
+    # 环形缓冲区保存下标，队首始终是窗口内的极值
+    deque = np.empty(window, np.int64)
+    head = 0
+    size = 0
+    for i in range(n):
+        # 队首移出窗口
+        if size > 0 and deque[head] <= i - window:
+            head = (head + 1) % window
+            size -= 1
+        # 队尾弹出不可能再成为极值的下标
+        while size > 0:
+            back = values[deque[(head + size - 1) % window]]
+            if (find_max and back <= values[i]) or (not find_max and back >= values[i]):
+                size -= 1
+            else:
+                break
+        deque[(head + size) % window] = i
+        size += 1
+        if i >= window - 1:
+            out[i] = values[deque[head]]
+
+    return out
+
+
+@njit(cache=True)
+def rolling_max(values, window):
+    """滚动窗口最大值（单调队列实现）"""
+    return _rolling_extreme(values, window, True)
+
+
+@njit(cache=True)
+def rolling_min(values, window):
+    """滚动窗口最小值（单调队列实现）"""
+    return _rolling_extreme(values, window, False)
+
+
+@njit(cache=True)
+def stoch_kdj(high, low, close, fastk_period, slowk_period, slowd_period):
+    """
+    单次遍历计算KDJ指标（与TA-Lib STOCH + SMA平滑的结果一致）
+
+    Parameters:
+    high, low, close: ndarray - float64价格序列
+    fastk_period: int - RSV窗口
+    slowk_period: int - K值平滑周期
+    slowd_period: int - D值平滑周期
+
+    Returns:
+    tuple: (k, d, j) - 三个与输入等长的ndarray，前置不足部分为NaN
+    """
+    n = close.shape[0]
+    k = np.full(n, np.nan)
+    d = np.full(n, np.nan)
+    j = np.full(n, np.nan)
+
+    fastk_start = fastk_period - 1
+    slowk_start = fastk_start + slowk_period - 1
+    lookback = slowk_start + slowd_period - 1
+    if n <= lookback:
+        return k, d, j
+
+    # N日最高/最低价（单调队列，每根K线均摊O(1)）
+    highest_n = rolling_max(high, fastk_period)
+    lowest_n = rolling_min(low, fastk_period)
+
+    # RSV与Slow %K的环形缓冲区，只保留平滑窗口内的值，不分配整段中间数组
+    fastk_buf = np.empty(slowk_period)
+    slowk_buf = np.empty(slowd_period)
+    running_k = 0.0
+    running_d = 0.0
+
+    for i in range(fastk_start, n):
+        # RSV（Fast %K）
+        highest = highest_n[i]
+        lowest = lowest_n[i]
+        diff = highest - lowest
+        if diff != 0.0:
+            fastk = (close[i] - lowest) / diff * 100.0
+        else:
+            fastk = 0.0
+
+        # Slow %K = SMA(RSV)，Slow %D = SMA(Slow %K)
+        # 运算顺序与TA-Lib一致（先加新值、输出、再减去窗口首值），保证结果逐位相同
+        running_k += fastk
+        fastk_buf[(i - fastk_start) % slowk_period] = fastk
+        if i < slowk_start:
+            continue
+        slowk = running_k / slowk_period
+        running_k -= fastk_buf[(i - slowk_start) % slowk_period]
+
+        running_d += slowk
+        slowk_buf[(i - slowk_start) % slowd_period] = slowk
+        if i < lookback:
+            continue
+        k[i] = slowk
+        d[i] = running_d / slowd_period
+        j[i] = 3.0 * slowk - 2.0 * d[i]
+        running_d -= slowk_buf[(i - lookback) % slowd_period]
+
+    return k, d, j
+
+
+@njit(cache=True, error_model='numpy')
+def bbands(close, period, nbdev):
+    """
+    单次遍历计算布林带及其衍生指标（与TA-Lib BBANDS + SMA在浮点误差内一致）
+
+    Parameters:
+    close: ndarray - float64收盘价序列
+    period: int - 计算周期
+    nbdev: float - 标准差倍数
+
+    Returns:
+    tuple: (upper, middle, lower, width, percent_b) - 与输入等长的ndarray
+    """
+    n = close.shape[0]
+    upper = np.full(n, np.nan)
+    middle = np.full(n, np.nan)
+    lower = np.full(n, np.nan)
+    width = np.full(n, np.nan)
+    percent_b = np.full(n, np.nan)
+
+    start = period - 1
+    if n <= start:
+        return upper, middle, lower, width, percent_b
+
+    # 同时维护价格和与价格平方和，加新值、输出、再减旧值
+    total = 0.0
+    total2 = 0.0
+    for i in range(start):
+        total += close[i]
+        total2 += close[i] * close[i]
+
+    for i in range(start, n):
+        total += close[i]
+        total2 += close[i] * close[i]
+        mean = total / period
+        mean2 = total2 / period
+        old = close[i - start]
+        total -= old
+        total2 -= old * old
+
+        # 方差过小视为0，避免浮点误差导致负数开方
+        var = mean2 - mean * mean
+        std = np.sqrt(var) if var >= 0.00000001 else 0.0
+        band = std * nbdev
+
+        middle[i] = mean
+        upper[i] = mean + band
+        lower[i] = mean - band
+        width[i] = (upper[i] - lower[i]) / mean
+        percent_b[i] = (close[i] - lower[i]) / (upper[i] - lower[i])
+
+    return upper, middle, lower, width, percent_b
+
+
+@njit(cache=True)
+def ewm_mean(values, alpha):
+    """
+    指数加权移动平均 y_t = α·x_t + (1-α)·y_{t-1}（与pandas ewm(adjust=False).mean()一致）
+
+    Parameters:
+    values: ndarray - float64序列，允许包含NaN
+    alpha: float - 平滑系数，span对应alpha = 2 / (span + 1)
+
+    Returns:
+    ndarray - 与输入等长的EMA序列，首个有效值之前为NaN
+    """
+    n = values.shape[0]
+    out = np.empty(n)
+    if n == 0:
+        return out
+
+    old_wt_factor = 1.0 - alpha
+    weighted = values[0]
+    old_wt = 1.0
+    out[0] = weighted
+    for i in range(1, n):
+        cur = values[i]
+        is_observation = cur == cur
+        if weighted == weighted:
+            # 缺失值期间旧权重继续衰减，计算步骤与pandas保持一致
+            old_wt *= old_wt_factor
+            if is_observation:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                old_wt = 1.0
+        elif is_observation:
+            weighted = cur
+        out[i] = weighted
+
+    return out
+
+
+@njit(cache=True)
+def _ewm_step(prev, cur, alpha):
+    """无缺失值时ewm_mean的单步递推（old_wt恒为1-α，运算与ewm_mean逐位一致）"""
+    if prev == cur:
+        return prev
+    old_wt = 1.0 - alpha
+    return (old_wt * prev + alpha * cur) / (old_wt + alpha)
+
+
+@njit(cache=True)
+def macd_ewm(close, fast_alpha, slow_alpha, signal_alpha):
+    """
+    单次遍历计算基于ewm(adjust=False)的MACD（与三次调用ewm_mean的结果一致）
+
+    Parameters:
+    close: ndarray - float64收盘价序列，不含NaN
+    fast_alpha, slow_alpha, signal_alpha: float - 快线、慢线、信号线的平滑系数
+
+    Returns:
+    tuple: (ema_fast, ema_slow, macd, signal, histogram) - 与输入等长的ndarray
+    """
+    n = close.shape[0]
+    ema_fast = np.empty(n)
+    ema_slow = np.empty(n)
+    macd = np.empty(n)
+    signal = np.empty(n)
+    histogram = np.empty(n)
+    if n == 0:
+        return ema_fast, ema_slow, macd, signal, histogram
+
+    fast = close[0]
+    slow = close[0]
+    sig = fast - slow
+    for i in range(n):
+        if i > 0:
+            fast = _ewm_step(fast, close[i], fast_alpha)
+            slow = _ewm_step(slow, close[i], slow_alpha)
+            sig = _ewm_step(sig, fast - slow, signal_alpha)
+        ema_fast[i] = fast
+        ema_slow[i] = slow
+        macd[i] = fast - slow
+        signal[i] = sig
+        histogram[i] = fast - slow - sig
+
+    return ema_fast, ema_slow, macd, signal, histogram
+
+
+@njit(parallel=True, cache=True)
+def scan_cross_pairs(ma_matrix, pair_idx):
+    """
+    并行扫描多组均线的金叉死叉
+
+    Parameters:
+    ma_matrix: ndarray - (K线数, 均线数)的float64矩阵
+    pair_idx: ndarray - (组数, 2)的int64数组，每行为(快线列号, 慢线列号)
+
+    Returns:
+    tuple: (golden, death, counts) - golden/death为(组数, K线数)的布尔矩阵，
+           counts为(组数, 2)的金叉、死叉次数
+    """
+    n_bars = ma_matrix.shape[0]
+    n_pairs = pair_idx.shape[0]
+    golden = np.zeros((n_pairs, n_bars), dtype=np.bool_)
+    death = np.zeros((n_pairs, n_bars), dtype=np.bool_)
+    counts = np.zeros((n_pairs, 2), dtype=np.int64)
+    if n_bars == 0:
+        return golden, death, counts
+
+    # 各均线组合相互独立，按组并行
+    for p in prange(n_pairs):
+        fast = pair_idx[p, 0]
+        slow = pair_idx[p, 1]
+        diff_prev = ma_matrix[0, fast] - ma_matrix[0, slow]
+        for i in range(1, n_bars):
+            diff = ma_matrix[i, fast] - ma_matrix[i, slow]
+            # NaN参与比较结果为False，与pandas逐元素比较一致
+            if diff > 0 and diff_prev <= 0:
+                golden[p, i] = True
+                counts[p, 0] += 1
+            elif diff < 0 and diff_prev >= 0:
+                death[p, i] = True
+                counts[p, 1] += 1
+            diff_prev = diff
+
+    return golden, death, counts
+
+
+@njit(parallel=True, cache=True)
+def all_sma(close, periods):
+    """
+    一次性计算多个周期的简单移动平均（与TA-Lib SMA的结果一致）
+
+    Parameters:
+    close: ndarray - float64收盘价序列
+    periods: ndarray - int64周期数组
+
+    Returns:
+    ndarray - (周期数, K线数)的矩阵，每行对应一个周期，前置不足部分为NaN；
+              转置后即为按列存储的(K线数, 周期数)均线矩阵
+    """
+    n = close.shape[0]
+    n_periods = periods.shape[0]
+    out = np.full((n_periods, n), np.nan)
+
+    for p in prange(n_periods):
+        period = periods[p]
+        running = 0.0
+        for i in range(n):
+            # 先加新值、输出、再减去窗口首值，与TA-Lib运算顺序一致
+            running += close[i]
+            if i >= period - 1:
+                out[p, i] = running / period
+                running -= close[i - period + 1]
+
+    return out
+
+
+@njit(parallel=True, cache=True, fastmath={'contract'})
+def all_ema(close, periods):
+    """
+    一次性计算多个周期的指数移动平均（与TA-Lib EMA的结果一致）
+
+    Parameters:
+    close: ndarray - float64收盘价序列
+    periods: ndarray - int64周期数组
+
+    Returns:
+    ndarray - (周期数, K线数)的矩阵，每行对应一个周期，前period-1个位置为NaN
+    """
+    n = close.shape[0]
+    n_periods = periods.shape[0]
+    out = np.full((n_periods, n), np.nan)
+
+    for p in prange(n_periods):
+        period = periods[p]
+        if n < period:
+            continue
+        # 与TA-Lib相同：以前period个值的简单平均作为初值，再按 (x - prev) * k + prev 递推
+        # （fastmath只开启contract，允许合并为FMA指令，与TA-Lib编译结果逐位一致）
+        k = 2.0 / (period + 1)
+        total = 0.0
+        for i in range(period):
+            total += close[i]
+        prev = total / period
+        out[p, period - 1] = prev
+        for i in range(period, n):
+            prev = (close[i] - prev) * k + prev
+            out[p, i] = prev
+
+    return out
+
+
+@njit(cache=True, error_model='numpy')
+def max_drawdown(returns):
+    """
+    单次遍历计算最大回撤（与cumprod + expanding().max()的结果一致）
+
+    Parameters:
+    returns: ndarray - float64日收益率序列，NaN视为缺失
+
+    Returns:
+    float - 最大回撤（负数小数），没有有效数据时为NaN
+    """
+    cum = 1.0
+    peak = np.nan
+    mdd = np.nan
+    for i in range(returns.shape[0]):
+        r = returns[i]
+        if r != r:
+            continue
+        cum *= 1.0 + r
+        # 峰值取历史累计净值的最大值（不含初始净值1）
+        if peak != peak or cum > peak:
+            peak = cum
+        dd = (cum - peak) / peak
+        if dd == dd and (mdd != mdd or dd < mdd):
+            mdd = dd
+
+    return mdd
+
+
+@njit(cache=True)
+def summarize(values):
+    """
+    一次计算序列的常用统计量（NaN视为缺失，与pandas的skipna行为一致）
+
+    Parameters:
+    values: ndarray - float64序列
+
+    Returns:
+    tuple: (mean, std, minimum, maximum, positive, negative) - std为样本标准差(ddof=1)，
+           positive/negative为大于0、小于0的元素个数
+    """
+    count = 0
+    total = 0.0
+    minimum = np.nan
+    maximum = np.nan
+    positive = 0
+    negative = 0
+    for i in range(values.shape[0]):
+        v = values[i]
+        if v != v:
+            continue
+        if count == 0 or v < minimum:
+            minimum = v
+        if count == 0 or v > maximum:
+            maximum = v
+        if v > 0:
+            positive += 1
+        elif v < 0:
+            negative += 1
+        total += v
+        count += 1
+
+    mean = total / count if count > 0 else np.nan
+
+    # 第二遍累加离差平方和，避免平方和公式的精度损失
+    std = np.nan
+    if count > 1:
+        squares = 0.0
+        for i in range(values.shape[0]):
+            v = values[i]
+            if v == v:
+                squares += (v - mean) * (v - mean)
+        std = np.sqrt(squares / (count - 1))
+
+    return mean, std, minimum, maximum, positive, negative
+
+
+@njit(cache=True)
+def rolling_mean_std(values, window):
+    """
+    单次遍历同时计算滚动均值和滚动样本标准差
+    （与pandas rolling(window).mean()/.std()的结果逐位一致）
+
+    Parameters:
+    values: ndarray - float64序列，NaN视为缺失
+    window: int - 窗口长度，窗口内有效值不足window个时输出NaN
+
+    Returns:
+    tuple: (mean, std) - 与输入等长的ndarray
+    """
+    n = values.shape[0]
+    mean_out = np.full(n, np.nan)
+    std_out = np.full(n, np.nan)
+    # 均值状态：Kahan补偿求和，加入和移出分别维护补偿项（与pandas实现一致）
+    nobs = 0
+    sum_x = 0.0
+    comp_add = 0.0
+    comp_remove = 0.0
+    neg_ct = 0
+    # 方差状态：Welford在线算法，same_ct记录末尾连续相同值的个数
+    mean_x = 0.0
+    ssqdm = 0.0
+    vcomp_add = 0.0
+    vcomp_remove = 0.0
+    same_ct = 0
+    prev_value = values[0] if n > 0 else 0.0
+    for i in range(n):
+        # 移出窗口首值
+        if i >= window:
+            val = values[i - window]
+            if val == val:
+                nobs -= 1
+                y = -val - comp_remove
+                t = sum_x + y
+                comp_remove = t - sum_x - y
+                sum_x = t
+                if np.signbit(val):
+                    neg_ct -= 1
+                if nobs:
+                    prev_mean = mean_x - vcomp_remove
+                    y = val - vcomp_remove
+                    t = y - mean_x
+                    vcomp_remove = t + mean_x - y
+                    mean_x -= t / nobs
+                    ssqdm -= (val - prev_mean) * (val - mean_x)
+                else:
+                    mean_x = 0.0
+                    ssqdm = 0.0
+        # 加入新值
+        val = values[i]
+        if val == val:
+            nobs += 1
+            y = val - comp_add
+            t = sum_x + y
+            comp_add = t - sum_x - y
+            sum_x = t
+            if np.signbit(val):
+                neg_ct += 1
+            if val == prev_value:
+                same_ct += 1
+            else:
+                same_ct = 1
+            prev_value = val
+            prev_mean = mean_x - vcomp_add
+            y = val - vcomp_add
+            t = y - mean_x
+            vcomp_add = t + mean_x - y
+            mean_x += t / nobs
+            ssqdm += (val - prev_mean) * (val - mean_x)
+        if nobs >= window and nobs > 0:
+            m = sum_x / nobs
+            if same_ct >= nobs:
+                m = prev_value
+            elif neg_ct == 0 and m < 0:
+                m = 0.0
+            elif neg_ct == nobs and m > 0:
+                m = 0.0
+            mean_out[i] = m
+            if nobs > 1:
+                # 窗口内全为相同值时方差直接取0，避免浮点误差
+                if same_ct >= nobs:
+                    var = 0.0
+                else:
+                    var = ssqdm / (nobs - 1)
+                    if var < 0:
+                        var = 0.0
+                std_out[i] = np.sqrt(var)
+
+    return mean_out, std_out
+
+
+@njit(cache=True)
+def rsi(close, period):
+    """
+    Wilder平滑的相对强弱指标（与TA-Lib RSI在浮点误差内一致）
+
+    Parameters:
+    close: ndarray - float64收盘价序列
+    period: int - RSI周期
+
+    Returns:
+    ndarray - 与输入等长的RSI序列，前period个位置为NaN
+    """
+    n = close.shape[0]
+    out = np.full(n, np.nan)
+    if period < 2 or n <= period:
+        return out
+
+    # 初始周期内的平均涨幅和平均跌幅
+    gain = 0.0
+    loss = 0.0
+    for i in range(1, period + 1):
+        change = close[i] - close[i - 1]
+        if change < 0:
+            loss -= change
+        else:
+            gain += change
+    gain /= period
+    loss /= period
+
+    # 之后按Wilder方式平滑；平均涨跌幅均为0时RSI取0（与TA-Lib相同）
+    for i in range(period, n):
+        if i > period:
+            change = close[i] - close[i - 1]
+            loss *= period - 1
+            gain *= period - 1
+            if change < 0:
+                loss -= change
+            else:
+                gain += change
+            loss /= period
+            gain /= period
+        total = gain + loss
+        if total == 0.0:
+            out[i] = 0.0
+        else:
+            out[i] = 100.0 * (gain / total)
+
+    return out
+
+
+# 批量内核中调用的JIT版本（入口函数可能被下方的预编译版本替换，预编译函数无法在numba内核中调用）
+_jit_stoch_kdj = stoch_kdj
+_jit_bbands = bbands
+
+
+@njit(parallel=True, cache=True)
+def batch_indicators(high, low, close, fastk_period, slowk_period, slowd_period,
+                     rsi_period, bb_period, bb_nbdev):
+    """
+    并行计算多只股票的KDJ、RSI和布林带
+
+    Parameters:
+    high, low, close: ndarray - (股票数, K线数)的float64价格矩阵，每行一只股票
+    fastk_period, slowk_period, slowd_period: int - KDJ参数
+    rsi_period: int - RSI周期
+    bb_period: int - 布林带周期
+    bb_nbdev: float - 布林带标准差倍数
+
+    Returns:
+    tuple: (k, d, j, rsi, upper, middle, lower) - 与输入同形状的矩阵
+    """
+    n_symbols, n_bars = close.shape
+    k = np.empty((n_symbols, n_bars))
+    d = np.empty((n_symbols, n_bars))
+    j = np.empty((n_symbols, n_bars))
+    rsi_out = np.empty((n_symbols, n_bars))
+    upper = np.empty((n_symbols, n_bars))
+    middle = np.empty((n_symbols, n_bars))
+    lower = np.empty((n_symbols, n_bars))
+
+    # 各股票相互独立，按股票并行
+    for s in prange(n_symbols):
+        k[s], d[s], j[s] = _jit_stoch_kdj(high[s], low[s], close[s],
+                                          fastk_period, slowk_period, slowd_period)
+        rsi_out[s] = rsi(close[s], rsi_period)
+        band_upper, band_middle, band_lower, _, _ = _jit_bbands(close[s], bb_period, bb_nbdev)
+        upper[s] = band_upper
+        middle[s] = band_middle
+        lower[s] = band_lower
+
+    return k, d, j, rsi_out, upper, middle, lower
+
+
+# JIT版本的入口函数，供预编译脚本包装导出
+JIT_KERNELS = {
+    'stoch_kdj': stoch_kdj,
+    'bbands': bbands,
+    'ewm_mean': ewm_mean,
+    'macd_ewm': macd_ewm,
+    'max_drawdown': max_drawdown,
+    'summarize': summarize,
+    'rolling_mean_std': rolling_mean_std
+}
+
+# 优先使用预编译的扩展模块，避免每次冷启动的JIT编译开销
+try:
+    from . import fin_kernels
+except ImportError:
+    fin_kernels = None
+
+if NUMBA_AVAILABLE and fin_kernels is not None:
+    stoch_kdj = fin_kernels.stoch_kdj
+    bbands = fin_kernels.bbands
+    ewm_mean = fin_kernels.ewm_mean
+    macd_ewm = fin_kernels.macd_ewm
+    max_drawdown = fin_kernels.max_drawdown
+    summarize = fin_kernels.summarize
+    rolling_mean_std = fin_kernels.rolling_mean_std
@@ -2,10 +2,27 @@
 数据可视化模块
 """
 
-from .kline_chart import KLineChartRenderer, plot_kline_chart
-from .multi_timeframe import MultiTimeFrameAnalyzer, analyze_multi_timeframe
+import importlib
+
+# 子模块依赖matplotlib和mplfinance，导入较慢，首次访问对应名称时再加载（PEP 562）
+_LAZY_IMPORTS = {
+    'KLineChartRenderer': 'kline_chart',
+    'plot_kline_chart': 'kline_chart',
+    'render_batch': 'kline_chart',
+    'MultiTimeFrameAnalyzer': 'multi_timeframe',
+    'analyze_multi_timeframe': 'multi_timeframe'
+}
 
 __all__ = [
-    'KLineChartRenderer', 'plot_kline_chart',
+    'KLineChartRenderer', 'plot_kline_chart', 'render_batch',
     'MultiTimeFrameAnalyzer', 'analyze_multi_timeframe'
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
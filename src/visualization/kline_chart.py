@@ -7,22 +7,32 @@ import pandas as pd
 import numpy as np
 import mplfinance as mpf
 import matplotlib.pyplot as plt
-import matplotlib.gridspec as gridspec
-from matplotlib.patches import Rectangle
 import sys
 import os
 
-# 添加父目录到Python路径
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# 添加父目录到Python路径（已在路径中时不再重复添加）
+_src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if _src_dir not in sys.path:
+    sys.path.append(_src_dir)
 from utils.config import CHART_STYLE, PATHS
-from utils.helpers import ensure_directory_exists
+from utils.helpers import calculate_sma, calculate_rolling_std, split_histogram, save_figure
 
 
 class KLineChartRenderer:
     """K线图渲染类"""
     
-    def __init__(self):
-        """初始化K线图渲染器"""
+    def __init__(self, draft=False, auto_close=False):
+        """
+        初始化K线图渲染器
+        
+        Parameters:
+        draft: bool - 草稿模式，保存图片时使用较低分辨率并跳过紧凑边界计算
+        auto_close: bool - 传入save_path保存后自动关闭图表（返回的图表对象不再显示），
+                           批量生成大量图表时内存占用不随图表数量增长
+        """
+        self.draft = draft
+        self.auto_close = auto_close
+        
         # 设置中文字体和负号显示
         plt.rcParams['font.sans-serif'] = [CHART_STYLE['font_family']]
         plt.rcParams['axes.unicode_minus'] = False
@@ -30,6 +40,13 @@ class KLineChartRenderer:
         
         # 创建自定义样式
         self.custom_style = self._create_custom_style()
+        
+        # 成交量均线缓存：(数据对象, 周期, 均线)，同一数据连续绘制多张图时只计算一次
+        self._volume_ma_cache = None
+        
+        # plot_basic_kline(reuse_fig=True)复用的图表对象
+        self._basic_fig = None
+        self._basic_axes = None
     
     def _create_custom_style(self):
         """
@@ -59,7 +76,27 @@ class KLineChartRenderer:
         
         return style
     
-    def plot_basic_kline(self, data, title="K线图", figsize=(12, 8), save_path=None):
+    def _get_volume_ma(self, data, window=5):
+        """
+        获取成交量移动平均线（同一数据对象重复绘图时复用上次结果）
+        
+        Parameters:
+        data: DataFrame - 包含Volume列的DataFrame
+        window: int - 均线周期
+        
+        Returns:
+        Series - 成交量移动平均线
+        """
+        cache = self._volume_ma_cache
+        # 按对象本身（而非id）比较，缓存持有引用，不会误用已释放对象的id
+        if cache is not None and cache[0] is data and cache[1] == window:
+            return cache[2]
+        
+        volume_ma = calculate_sma(data['Volume'], window)
+        self._volume_ma_cache = (data, window, volume_ma)
+        return volume_ma
+    
+    def plot_basic_kline(self, data, title="K线图", figsize=(12, 8), save_path=None, reuse_fig=False):
         """
         绘制基础K线图
         
@@ -68,21 +105,43 @@ class KLineChartRenderer:
         title: str - 图表标题
         figsize: tuple - 图表大小
         save_path: str - 保存路径，None表示不保存
+        reuse_fig: bool - 是否复用上次以reuse_fig=True绘制的图表（清空后重绘），
+                          批量导出多只股票时省去每张图创建Figure和坐标轴的开销
         
         Returns:
         tuple - (fig, axes) 图表对象
         """
-        fig, axes = mpf.plot(
-            data,
-            type='candle',
-            style=self.custom_style,
-            title=title,
-            ylabel='价格',
-            volume=True,
-            ylabel_lower='成交量',
-            figsize=figsize,
-            returnfig=True
-        )
+        if reuse_fig and self._basic_fig is not None and plt.fignum_exists(self._basic_fig.number):
+            fig, axes = self._basic_fig, self._basic_axes
+            for ax in axes:
+                ax.cla()
+            
+            # 外部坐标轴模式：在已有的主图和成交量坐标轴上重绘
+            fig.set_size_inches(figsize)
+            mpf.plot(
+                data,
+                type='candle',
+                style=self.custom_style,
+                ylabel='价格',
+                ax=axes[0],
+                volume=axes[2],
+                ylabel_lower='成交量'
+            )
+            fig.suptitle(title)
+        else:
+            fig, axes = mpf.plot(
+                data,
+                type='candle',
+                style=self.custom_style,
+                title=title,
+                ylabel='价格',
+                volume=True,
+                ylabel_lower='成交量',
+                figsize=figsize,
+                returnfig=True
+            )
+            if reuse_fig:
+                self._basic_fig, self._basic_axes = fig, axes
         
         # 添加网格线并设置透明度
         for ax in axes:
@@ -90,11 +149,18 @@ class KLineChartRenderer:
             ax.tick_params(axis='both', labelsize=10)
         
         if save_path:
-            ensure_directory_exists(os.path.dirname(save_path))
-            fig.savefig(save_path, bbox_inches='tight', dpi=300)
+            # 复用的图表由close()统一关闭
+            save_figure(fig, save_path, self.draft, self.auto_close and not reuse_fig)
         
         return fig, axes
     
+    def close(self):
+        """关闭plot_basic_kline(reuse_fig=True)复用的图表，释放内存"""
+        if self._basic_fig is not None:
+            plt.close(self._basic_fig)
+            self._basic_fig = None
+            self._basic_axes = None
+    
     def plot_kline_with_ma(self, data, ma_data, title="K线图+移动平均线", figsize=(12, 8), save_path=None):
         """
         绘制带移动平均线的K线图
@@ -114,7 +180,7 @@ class KLineChartRenderer:
         ma_colors = ['blue', 'orange', 'purple', 'brown', 'pink', 'gray']
         
         for i, (ma_name, ma_series) in enumerate(ma_data.items()):
-            if not ma_series.isna().all():
+            if not np.isnan(ma_series.values).all():
                 color = ma_colors[i % len(ma_colors)]
                 addplots.append(
                     mpf.make_addplot(ma_series, color=color, width=1.5, label=ma_name)
@@ -139,8 +205,7 @@ class KLineChartRenderer:
             ax.tick_params(axis='both', labelsize=10)
         
         if save_path:
-            ensure_directory_exists(os.path.dirname(save_path))
-            fig.savefig(save_path, bbox_inches='tight', dpi=300)
+            save_figure(fig, save_path, self.draft, self.auto_close)
         
         return fig, axes
     
@@ -181,7 +246,7 @@ class KLineChartRenderer:
         ax_main = axes[0]
         upper = bollinger_data['BB_Upper'].values
         lower = bollinger_data['BB_Lower'].values
-        x_values = range(len(data))
+        x_values = np.arange(len(data))
         
         # 填充布林带区域
         ax_main.fill_between(x_values, upper, lower, alpha=0.1, color='gray')
@@ -192,12 +257,12 @@ class KLineChartRenderer:
             ax.tick_params(axis='both', labelsize=10)
         
         if save_path:
-            ensure_directory_exists(os.path.dirname(save_path))
-            fig.savefig(save_path, bbox_inches='tight', dpi=300)
+            save_figure(fig, save_path, self.draft, self.auto_close)
         
         return fig, axes
     
-    def plot_bollinger_bandwidth(self, data, band_width, title="布林带宽度变化", figsize=(12, 6), save_path=None):
+    def plot_bollinger_bandwidth(self, data, band_width, title="布林带宽度变化", figsize=(12, 6), save_path=None,
+                                 width_stats=None):
         """
         绘制布林带宽度变化图（Task2-2）
         
@@ -207,6 +272,7 @@ class KLineChartRenderer:
         title: str - 标题
         figsize: tuple - 图表大小
         save_path: str - 保存路径
+        width_stats: tuple - 已计算的(20日均值, 20日标准差)，为None时自动计算
         
         Returns:
         tuple - (fig, ax) 图表对象
@@ -217,8 +283,9 @@ class KLineChartRenderer:
         ax.plot(data.index, band_width, color='blue', linewidth=2, label='布林带宽度')
         
         # 计算带宽均值和标准差
-        width_ma = band_width.rolling(window=20).mean()
-        width_std = band_width.rolling(window=20).std()
+        if width_stats is None:
+            width_stats = (calculate_sma(band_width, 20), calculate_rolling_std(band_width, 20))
+        width_ma, width_std = width_stats
         
         # 绘制均值和波段
         ax.plot(data.index, width_ma, color='orange', linewidth=1.5, linestyle='--', label='20日均值')
@@ -237,8 +304,7 @@ class KLineChartRenderer:
         ax.tick_params(axis='both', labelsize=10)
         
         if save_path:
-            ensure_directory_exists(os.path.dirname(save_path))
-            fig.savefig(save_path, bbox_inches='tight', dpi=300)
+            save_figure(fig, save_path, self.draft, self.auto_close)
         
         return fig, ax
     
@@ -262,13 +328,10 @@ class KLineChartRenderer:
         histogram = macd_data['Histogram']
         
         # 分离正负柱状图
-        histogram_positive = histogram.copy()
-        histogram_positive[histogram_positive < 0] = np.nan
-        histogram_negative = histogram.copy()
-        histogram_negative[histogram_negative >= 0] = np.nan
+        histogram_positive, histogram_negative = split_histogram(histogram)
         
         # 计算成交量移动平均线
-        volume_ma = data['Volume'].rolling(window=5).mean()
+        volume_ma = self._get_volume_ma(data)
         
         # 创建附加图 - MACD在panel=1，成交量移动平均线在panel=2
         addplots = [
@@ -319,8 +382,7 @@ class KLineChartRenderer:
                        bbox=dict(boxstyle='round', facecolor='orange', alpha=0.3))
         
         if save_path:
-            ensure_directory_exists(os.path.dirname(save_path))
-            fig.savefig(save_path, bbox_inches='tight', dpi=300)
+            save_figure(fig, save_path, self.draft, self.auto_close)
         
         return fig, axes
     
@@ -344,7 +406,7 @@ class KLineChartRenderer:
         # 添加移动平均线
         ma_colors = ['blue', 'orange', 'red', 'green', 'purple']
         for i, (ma_name, ma_series) in enumerate(ma_data.items()):
-            if not ma_series.isna().all():
+            if not np.isnan(ma_series.values).all():
                 color = ma_colors[i % len(ma_colors)]
                 addplots.append(mpf.make_addplot(ma_series, color=color, width=1.5, label=ma_name))
         
@@ -373,8 +435,7 @@ class KLineChartRenderer:
             ax.tick_params(axis='both', labelsize=10)
         
         if save_path:
-            ensure_directory_exists(os.path.dirname(save_path))
-            fig.savefig(save_path, bbox_inches='tight', dpi=300)
+            save_figure(fig, save_path, self.draft, self.auto_close)
         
         return fig, axes
     
@@ -393,7 +454,7 @@ class KLineChartRenderer:
         tuple - (fig, axes) 图表对象
         """
         # KDJ指标在panel=1，成交量移动平均线在panel=2
-        volume_ma = data['Volume'].rolling(window=5).mean()
+        volume_ma = self._get_volume_ma(data)
         
         addplots = [
             # KDJ指标在panel=1
@@ -446,8 +507,7 @@ class KLineChartRenderer:
                        bbox=dict(boxstyle='round', facecolor='purple', alpha=0.3))
         
         if save_path:
-            ensure_directory_exists(os.path.dirname(save_path))
-            fig.savefig(save_path, bbox_inches='tight', dpi=300)
+            save_figure(fig, save_path, self.draft, self.auto_close)
         
         return fig, axes
     
@@ -466,7 +526,7 @@ class KLineChartRenderer:
         tuple - (fig, axes) 图表对象
         """
         # RSI指标在panel=1，成交量移动平均线在panel=2
-        volume_ma = data['Volume'].rolling(window=5).mean()
+        volume_ma = self._get_volume_ma(data)
         
         addplots = [
             # RSI指标在panel=1
@@ -502,9 +562,10 @@ class KLineChartRenderer:
                 ax.axhline(y=50, color='gray', linestyle='-', alpha=0.3, linewidth=0.8)
                 ax.set_ylim(0, 100)
                 ax.set_ylabel('RSI (%)', fontsize=12)
-                # 添加RSI区域填充
-                ax.fill_between(range(len(rsi_data)), 70, 100, alpha=0.1, color='red', label='超买区')
-                ax.fill_between(range(len(rsi_data)), 0, 30, alpha=0.1, color='green', label='超卖区')
+                # 添加RSI区域填充（两个区域共用同一横坐标数组）
+                x_values = np.arange(len(rsi_data))
+                ax.fill_between(x_values, 70, 100, alpha=0.1, color='red', label='超买区')
+                ax.fill_between(x_values, 0, 30, alpha=0.1, color='green', label='超卖区')
                 # 添加图例
                 ax.text(0.02, 0.95, 'RSI(14)', transform=ax.transAxes, fontsize=10, 
                        bbox=dict(boxstyle='round', facecolor='purple', alpha=0.3))
@@ -520,8 +581,7 @@ class KLineChartRenderer:
                        bbox=dict(boxstyle='round', facecolor='brown', alpha=0.3))
         
         if save_path:
-            ensure_directory_exists(os.path.dirname(save_path))
-            fig.savefig(save_path, bbox_inches='tight', dpi=300)
+            save_figure(fig, save_path, self.draft, self.auto_close)
         
         return fig, axes
     
@@ -541,11 +601,16 @@ class KLineChartRenderer:
         """
         addplots = []
         
+        # 副图面板：面板1为成交量，实际提供的指标依次占用后续面板（缺少某个指标时不留空面板）；
+        # 指标固定画在各面板的主坐标轴上，与下方的参考线和标签共用同一纵轴
+        indicator_panels = [name for name in ('macd_data', 'kdj_data', 'rsi_data') if name in indicators_data]
+        panel_of = {name: panel for panel, name in enumerate(indicator_panels, start=2)}
+        
         # 添加移动平均线
         if 'ma_data' in indicators_data:
             ma_colors = ['blue', 'orange', 'purple', 'brown']
             for i, (ma_name, ma_series) in enumerate(indicators_data['ma_data'].items()):
-                if not ma_series.isna().all():
+                if not np.isnan(ma_series.values).all():
                     color = ma_colors[i % len(ma_colors)]
                     addplots.append(mpf.make_addplot(ma_series, color=color, width=1))
         
@@ -559,44 +624,37 @@ class KLineChartRenderer:
             ])
         
         # 添加MACD
-        if 'macd_data' in indicators_data:
+        if 'macd_data' in panel_of:
+            panel = panel_of['macd_data']
             macd_data = indicators_data['macd_data']
-            histogram = macd_data['Histogram']
-            histogram_positive = histogram.copy()
-            histogram_positive[histogram_positive < 0] = np.nan
-            histogram_negative = histogram.copy()  
-            histogram_negative[histogram_negative >= 0] = np.nan
+            histogram_positive, histogram_negative = split_histogram(macd_data['Histogram'])
             
             addplots.extend([
-                mpf.make_addplot(macd_data['MACD'], panel=1, color='red', width=1.5),
-                mpf.make_addplot(macd_data['Signal'], panel=1, color='blue', width=1.5),
-                mpf.make_addplot(histogram_positive, panel=1, type='bar', width=0.8, color='red', alpha=0.8),
-                mpf.make_addplot(histogram_negative, panel=1, type='bar', width=0.8, color='green', alpha=0.8)
+                mpf.make_addplot(macd_data['MACD'], panel=panel, color='red', width=1.5, secondary_y=False),
+                mpf.make_addplot(macd_data['Signal'], panel=panel, color='blue', width=1.5, secondary_y=False),
+                mpf.make_addplot(histogram_positive, panel=panel, type='bar', width=0.8, color='red', alpha=0.8,
+                                 secondary_y=False),
+                mpf.make_addplot(histogram_negative, panel=panel, type='bar', width=0.8, color='green', alpha=0.8,
+                                 secondary_y=False)
             ])
         
         # 添加KDJ和RSI
-        if 'kdj_data' in indicators_data:
+        if 'kdj_data' in panel_of:
+            panel = panel_of['kdj_data']
             kdj_data = indicators_data['kdj_data']
             addplots.extend([
-                mpf.make_addplot(kdj_data['K'], panel=2, color='blue', width=1),
-                mpf.make_addplot(kdj_data['D'], panel=2, color='orange', width=1),
-                mpf.make_addplot(kdj_data['J'], panel=2, color='red', width=1)
+                mpf.make_addplot(kdj_data['K'], panel=panel, color='blue', width=1, secondary_y=False),
+                mpf.make_addplot(kdj_data['D'], panel=panel, color='orange', width=1, secondary_y=False),
+                mpf.make_addplot(kdj_data['J'], panel=panel, color='red', width=1, secondary_y=False)
             ])
         
-        if 'rsi_data' in indicators_data:
+        if 'rsi_data' in panel_of:
             rsi_data = indicators_data['rsi_data']
-            addplots.append(mpf.make_addplot(rsi_data, panel=3, color='purple', width=1.5))
+            addplots.append(mpf.make_addplot(rsi_data, panel=panel_of['rsi_data'], color='purple', width=1.5,
+                                             secondary_y=False))
         
-        # 确定面板比例
-        panel_count = 1  # 主图
-        if 'macd_data' in indicators_data:
-            panel_count += 1
-        if 'kdj_data' in indicators_data:
-            panel_count += 1
-        if 'rsi_data' in indicators_data:
-            panel_count += 1
-        
-        panel_ratios = [3] + [1] * (panel_count - 1)  # 主图占3，其他每个占1
+        # 面板比例：主图占3，成交量和各指标面板各占1
+        panel_ratios = [3, 1] + [1] * len(indicator_panels)
         
         fig, axes = mpf.plot(
             data,
@@ -605,39 +663,47 @@ class KLineChartRenderer:
             title=title,
             ylabel='价格',
             volume=True,
+            volume_panel=1,
+            ylabel_lower='成交量',
             addplot=addplots,
             panel_ratios=panel_ratios,
             figsize=figsize,
             returnfig=True
         )
         
-        # 格式化各个面板
-        panel_labels = ['价格', 'MACD', 'KDJ', 'RSI']
-        for i, ax in enumerate(axes[:-1]):  # 除了成交量面板
+        # 各指标面板的标签和参考线
+        panel_labels = {'macd_data': 'MACD', 'kdj_data': 'KDJ', 'rsi_data': 'RSI'}
+        reference_lines = {
+            'macd_data': [dict(y=0, color='black', linestyle='-', linewidth=0.8, alpha=0.8)],
+            'kdj_data': [dict(y=80, color='red', linestyle='--', alpha=0.5),
+                         dict(y=20, color='green', linestyle='--', alpha=0.5)],
+            'rsi_data': [dict(y=70, color='red', linestyle='--', alpha=0.5),
+                         dict(y=30, color='green', linestyle='--', alpha=0.5)]
+        }
+        
+        # 格式化各个面板（mplfinance按面板依次返回主、次两个坐标轴，主坐标轴位于偶数位置）
+        for panel, ax in enumerate(axes[::2]):
             ax.grid(True, alpha=0.3, linestyle='--')
             ax.tick_params(axis='both', labelsize=10)
             
-            if i < len(panel_labels):
-                ax.set_ylabel(panel_labels[i], fontsize=12)
-            
-            # 为指标面板添加参考线
-            if i == 1 and 'macd_data' in indicators_data:  # MACD面板
-                ax.axhline(y=0, color='black', linestyle='-', linewidth=0.8, alpha=0.8)
-            elif i == 2 and 'kdj_data' in indicators_data:  # KDJ面板
-                ax.axhline(y=80, color='red', linestyle='--', alpha=0.5)
-                ax.axhline(y=20, color='green', linestyle='--', alpha=0.5)
-            elif i == 3 and 'rsi_data' in indicators_data:  # RSI面板
-                ax.axhline(y=70, color='red', linestyle='--', alpha=0.5)
-                ax.axhline(y=30, color='green', linestyle='--', alpha=0.5)
+            if panel >= 2:
+                name = indicator_panels[panel - 2]
+                ax.set_ylabel(panel_labels[name], fontsize=12)
+                for line in reference_lines[name]:
+                    ax.axhline(**line)
         
         if save_path:
-            ensure_directory_exists(os.path.dirname(save_path))
-            fig.savefig(save_path, bbox_inches='tight', dpi=300)
+            save_figure(fig, save_path, self.draft, self.auto_close)
         
         return fig, axes
 
 
-def plot_kline_chart(data, chart_type='basic', indicators_data=None, title=None, save_path=None):
+# 便捷函数共用的渲染器，首次绘图时创建
+_default_renderer = None
+
+
+def plot_kline_chart(data, chart_type='basic', indicators_data=None, title=None, save_path=None,
+                     auto_close=False):
     """
     便捷函数：绘制K线图
     
@@ -647,27 +713,84 @@ def plot_kline_chart(data, chart_type='basic', indicators_data=None, title=None,
     indicators_data: dict - 技术指标数据
     title: str - 图表标题
     save_path: str - 保存路径
+    auto_close: bool - 保存后关闭图表，批量绘图时避免内存持续增长
     
     Returns:
     tuple - (fig, axes) 图表对象
     """
-    renderer = KLineChartRenderer()
+    global _default_renderer
+    if _default_renderer is None:
+        _default_renderer = KLineChartRenderer()
+    renderer = _default_renderer
     
     if title is None:
         title = f"K线图 - {chart_type.upper()}"
     
-    if chart_type == 'basic':
-        return renderer.plot_basic_kline(data, title, save_path=save_path)
-    elif chart_type == 'ma' and indicators_data:
-        return renderer.plot_kline_with_ma(data, indicators_data, title, save_path=save_path)
+    if chart_type == 'ma' and indicators_data:
+        fig, axes = renderer.plot_kline_with_ma(data, indicators_data, title, save_path=save_path)
     elif chart_type == 'bollinger' and indicators_data:
-        return renderer.plot_kline_with_bollinger(data, indicators_data, title, save_path=save_path)
+        fig, axes = renderer.plot_kline_with_bollinger(data, indicators_data, title, save_path=save_path)
     elif chart_type == 'macd_volume' and indicators_data:
-        return renderer.plot_kline_with_macd_volume(data, indicators_data, title, save_path=save_path)
+        fig, axes = renderer.plot_kline_with_macd_volume(data, indicators_data, title, save_path=save_path)
     elif chart_type == 'comprehensive' and indicators_data:
-        return renderer.plot_comprehensive_chart(data, indicators_data, title, save_path=save_path)
+        fig, axes = renderer.plot_comprehensive_chart(data, indicators_data, title, save_path=save_path)
     else:
-        return renderer.plot_basic_kline(data, title, save_path=save_path)
+        fig, axes = renderer.plot_basic_kline(data, title, save_path=save_path)
+    
+    if auto_close and save_path:
+        plt.close(fig)
+    
+    return fig, axes
+
+
+def _init_render_worker():
+    """批量绘图子进程初始化：使用非交互式后端，只渲染保存文件"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _render_job(job):
+    """在子进程中绘制并保存单张K线图，返回保存路径"""
+    data, chart_type, save_path, *rest = job
+    indicators_data = rest[0] if len(rest) > 0 else None
+    title = rest[1] if len(rest) > 1 else None
+    plot_kline_chart(data, chart_type, indicators_data, title, save_path=save_path, auto_close=True)
+    return save_path
+
+
+def render_batch(jobs, n_workers=None):
+    """
+    多进程批量绘制并保存K线图（各图表相互独立，按进程并行渲染）
+    
+    Parameters:
+    jobs: list - 绘图任务列表，每项为(data, chart_type, save_path[, indicators_data[, title]])，
+                 各任务的save_path必须互不相同
+    n_workers: int - 进程数，默认为CPU核数
+    
+    Returns:
+    list - 成功保存的图片路径
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    save_paths = [job[2] for job in jobs]
+    if len(set(save_paths)) != len(save_paths):
+        raise ValueError("批量绘图任务的保存路径不能重复")
+    
+    # 使用spawn启动子进程：主进程中numba并行内核已启动TBB线程池，fork后进程退出时会卡死
+    mp_context = multiprocessing.get_context('spawn')
+    
+    saved_paths = []
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context,
+                             initializer=_init_render_worker) as executor:
+        futures = [executor.submit(_render_job, job) for job in jobs]
+        for save_path, future in zip(save_paths, futures):
+            try:
+                saved_paths.append(future.result())
+            except Exception as e:
+                print(f"❌ 图表绘制失败 {save_path}: {e}")
+    
+    return saved_paths
 
 
 if __name__ == "__main__":
@@ -7,29 +7,50 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gridspec
-import mplfinance as mpf
-from matplotlib.patches import Rectangle
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+import itertools
 import sys
 import os
 
-# 添加父目录到Python路径
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# 添加父目录到Python路径（已在路径中时不再重复添加）
+_src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if _src_dir not in sys.path:
+    sys.path.append(_src_dir)
 from utils.config import CHART_STYLE, PATHS
-from utils.helpers import ensure_directory_exists
+from utils.helpers import save_figure, calculate_ema, calculate_sma, resample_ohlcv
+# _ewm_step与macd_ewm共用同一单步递推，增量更新与全量计算逐位一致
+from utils.kernels import NUMBA_AVAILABLE, macd_ewm, _ewm_step
 from visualization.kline_chart import KLineChartRenderer
 
 
 class MultiTimeFrameAnalyzer:
     """多时间周期分析器"""
     
-    def __init__(self):
-        """初始化多时间周期分析器"""
+    def __init__(self, draft=False, auto_close=False):
+        """
+        初始化多时间周期分析器
+        
+        Parameters:
+        draft: bool - 草稿模式，保存图片时使用较低分辨率并跳过紧凑边界计算
+        auto_close: bool - 传入save_path保存后自动关闭图表（返回的图表对象不再显示），
+                           批量生成大量图表时内存占用不随图表数量增长
+        """
+        self.draft = draft
+        self.auto_close = auto_close
+        
         # 设置中文字体
         plt.rcParams['font.sans-serif'] = [CHART_STYLE['font_family']]
         plt.rcParams['axes.unicode_minus'] = False
         plt.rcParams['figure.dpi'] = CHART_STYLE['figure_dpi']
         
-        self.renderer = KLineChartRenderer()
+        self.renderer = KLineChartRenderer(draft=draft, auto_close=auto_close)
+        
+        # 多周期数据缓存：(日线数据对象, 行数, 最后日期, 各周期数据)，同一日线数据重复分析时不再重新聚合
+        self._timeframe_cache = None
+        
+        # 各周期MACD的递推状态，由calculate_multi_timeframe_macd初始化，供update_macd增量更新
+        self._macd_state = {}
     
     def prepare_multi_timeframe_data(self, daily_data):
         """
@@ -41,32 +62,27 @@ class MultiTimeFrameAnalyzer:
         Returns:
         dict - 包含日线、周线、月线数据的字典
         """
+        last_date = daily_data.index[-1] if len(daily_data) > 0 else None
+        cache = self._timeframe_cache
+        # 按对象本身比较，并核对行数和最后日期，原地追加数据后不会误用旧结果
+        if (cache is not None and cache[0] is daily_data
+                and cache[1] == len(daily_data) and cache[2] == last_date):
+            return dict(cache[3])
+        
         # 日线数据（已有）
         daily = daily_data.copy()
         
-        # 转换为周线数据
-        weekly = daily_data.resample('W').agg({
-            'Open': 'first',
-            'High': 'max',
-            'Low': 'min', 
-            'Close': 'last',
-            'Volume': 'sum'
-        }).dropna()
-        
-        # 转换为月线数据
-        monthly = daily_data.resample('M').agg({
-            'Open': 'first',
-            'High': 'max',
-            'Low': 'min',
-            'Close': 'last',
-            'Volume': 'sum'
-        }).dropna()
-        
-        return {
+        # 转换为周线、月线数据（按周期分组后各列一次聚合）
+        weekly = resample_ohlcv(daily_data, 'W')
+        monthly = resample_ohlcv(daily_data, 'M')
+        
+        timeframe_data = {
             'daily': daily,
             'weekly': weekly,
             'monthly': monthly
         }
+        self._timeframe_cache = (daily_data, len(daily_data), last_date, timeframe_data)
+        return dict(timeframe_data)
     
     def calculate_multi_timeframe_ma(self, timeframe_data):
         """
@@ -94,7 +110,7 @@ class MultiTimeFrameAnalyzer:
             ma_data = {}
             for period in periods:
                 if len(close_prices) >= period:
-                    ma_data[f'MA_{period}'] = close_prices.rolling(window=period).mean()
+                    ma_data[f'MA_{period}'] = calculate_sma(close_prices, period)
             
             ma_results[timeframe] = ma_data
         
@@ -116,28 +132,115 @@ class MultiTimeFrameAnalyzer:
             close_prices = data['Close']
             
             # 根据时间周期调整MACD参数
-            if timeframe == 'daily':
-                fast, slow, signal = 12, 26, 9
-            elif timeframe == 'weekly':
-                fast, slow, signal = 12, 26, 9  # 周线使用相同参数
-            else:  # monthly
-                fast, slow, signal = 6, 12, 5   # 月线使用较短参数
-            
-            # 手动计算MACD
-            ema_fast = close_prices.ewm(span=fast, adjust=False).mean()
-            ema_slow = close_prices.ewm(span=slow, adjust=False).mean()
-            macd_line = ema_fast - ema_slow
-            signal_line = macd_line.ewm(span=signal, adjust=False).mean()
-            histogram = macd_line - signal_line
-            
-            macd_results[timeframe] = {
-                'MACD': macd_line,
-                'Signal': signal_line,
-                'Histogram': histogram
-            }
+            fast, slow, signal = self._get_macd_periods(timeframe)
+            
+            close_values = close_prices.to_numpy(dtype=np.float64)
+            if NUMBA_AVAILABLE and not np.isnan(close_values).any():
+                # 快慢EMA、MACD线、信号线和柱状图在同一次遍历中递推
+                ema_fast, ema_slow, macd_values, signal_values, histogram_values = macd_ewm(
+                    close_values, 2.0 / (fast + 1.0), 2.0 / (slow + 1.0), 2.0 / (signal + 1.0)
+                )
+                index = close_prices.index
+                macd_results[timeframe] = {
+                    'MACD': pd.Series(macd_values, index=index),
+                    'Signal': pd.Series(signal_values, index=index),
+                    'Histogram': pd.Series(histogram_values, index=index)
+                }
+            else:
+                # 手动计算MACD
+                ema_fast = calculate_ema(close_prices, fast)
+                ema_slow = calculate_ema(close_prices, slow)
+                macd_line = ema_fast - ema_slow
+                signal_line = calculate_ema(macd_line, signal)
+                histogram = macd_line - signal_line
+                
+                macd_results[timeframe] = {
+                    'MACD': macd_line,
+                    'Signal': signal_line,
+                    'Histogram': histogram
+                }
+                ema_fast, ema_slow, signal_values = ema_fast.values, ema_slow.values, signal_line.values
+            
+            # 记录最后两根K线的(快线EMA, 慢线EMA, 信号线)，最后一根可在update_macd中被修正
+            self._macd_state.pop(timeframe, None)
+            if len(close_values) > 0 and not np.isnan(close_values).any():
+                states = [(ema_fast[k], ema_slow[k], signal_values[k])
+                          for k in range(max(len(close_values) - 2, 0), len(close_values))]
+                self._macd_state[timeframe] = {
+                    'periods': (fast, slow, signal),
+                    'prev': states[-2] if len(states) == 2 else None,
+                    'last': states[-1],
+                    'series': macd_results[timeframe]
+                }
         
         return macd_results
     
+    def _get_macd_periods(self, timeframe):
+        """
+        获取各时间周期使用的MACD参数
+        
+        Parameters:
+        timeframe: str - 时间周期
+        
+        Returns:
+        tuple - (快线周期, 慢线周期, 信号线周期)
+        """
+        if timeframe in ('daily', 'weekly'):
+            return 12, 26, 9  # 周线使用与日线相同的参数
+        return 6, 12, 5       # 月线使用较短参数
+    
+    def update_macd(self, timeframe, date, close):
+        """
+        用新收盘价递推更新某一周期的MACD
+        
+        MACD数值按递推状态O(1)计算，无需重新计算整个序列；返回的序列为追加后的新数组，
+        单次调用仍需复制已有序列（O(N)）
+        
+        Parameters:
+        timeframe: str - 时间周期（'daily'、'weekly'、'monthly'）
+        date: Timestamp - 该周期K线的日期标签；与最后一根K线相同时视为修正尚未走完的周线/月线，
+                          否则追加一根新K线
+        close: float - 收盘价
+        
+        Returns:
+        dict - 更新后该周期的MACD、Signal、Histogram序列
+        """
+        state = self._macd_state.get(timeframe)
+        if state is None:
+            raise ValueError(f"请先调用calculate_multi_timeframe_macd计算{timeframe}周期的MACD")
+        
+        fast_period, slow_period, signal_period = state['periods']
+        series = state['series']
+        index = series['MACD'].index
+        replace_last = date == index[-1]
+        base = state['prev'] if replace_last else state['last']
+        
+        close = float(close)
+        if base is None:
+            # 序列只有这一根K线：EMA从收盘价起步
+            ema_fast = ema_slow = close
+            signal = 0.0
+        else:
+            ema_fast = _ewm_step(base[0], close, 2.0 / (fast_period + 1.0))
+            ema_slow = _ewm_step(base[1], close, 2.0 / (slow_period + 1.0))
+            signal = _ewm_step(base[2], ema_fast - ema_slow, 2.0 / (signal_period + 1.0))
+        macd_value = ema_fast - ema_slow
+        new_values = (macd_value, signal, macd_value - signal)
+        
+        if replace_last:
+            new_index = index
+            updated = {key: np.append(s.values[:-1], value)
+                       for (key, s), value in zip(series.items(), new_values)}
+        else:
+            new_index = index.append(pd.Index([date]))
+            updated = {key: np.append(s.values, value)
+                       for (key, s), value in zip(series.items(), new_values)}
+            state['prev'] = state['last']
+        
+        state['last'] = (ema_fast, ema_slow, signal)
+        state['series'] = {key: pd.Series(values, index=new_index) for key, values in updated.items()}
+        return state['series']
+    
     def analyze_multi_timeframe_trend(self, timeframe_data, ma_data):
         """
         分析多时间周期趋势
@@ -155,17 +258,15 @@ class MultiTimeFrameAnalyzer:
             data = timeframe_data[timeframe]
             mas = ma_data[timeframe]
             
-            current_price = data['Close'].iloc[-1]
+            close_values = data['Close'].values
+            current_price = close_values[-1]
             
-            # 判断与移动平均线的关系
-            above_ma_count = 0
-            total_ma_count = 0
-            
-            for ma_name, ma_series in mas.items():
-                if not ma_series.isna().iloc[-1]:
-                    total_ma_count += 1
-                    if current_price > ma_series.iloc[-1]:
-                        above_ma_count += 1
+            # 判断与移动平均线的关系：各均线最新值一次比较，缺失值不计入
+            last_ma_values = np.fromiter((ma_series.values[-1] for ma_series in mas.values()),
+                                         dtype=np.float64, count=len(mas))
+            valid = ~np.isnan(last_ma_values)
+            total_ma_count = int(valid.sum())
+            above_ma_count = int((current_price > last_ma_values[valid]).sum())
             
             # 趋势判断
             if total_ma_count > 0:
@@ -183,7 +284,7 @@ class MultiTimeFrameAnalyzer:
             
             # 价格变化
             if len(data) >= 2:
-                price_change = (current_price - data['Close'].iloc[-2]) / data['Close'].iloc[-2]
+                price_change = (current_price - close_values[-2]) / close_values[-2]
                 price_change_pct = price_change * 100
             else:
                 price_change_pct = 0
@@ -223,11 +324,14 @@ class MultiTimeFrameAnalyzer:
         # 绘制K线
         self._plot_candlesticks(ax_main, data)
         
+        # 均线和MACD各图层共用同一横坐标数组
+        x_values = np.arange(len(data))
+        
         # 绘制移动平均线
         colors = ['blue', 'orange', 'red', 'green', 'purple']
         for j, (ma_name, ma_series) in enumerate(ma_indicators.items()):
             color = colors[j % len(colors)]
-            ax_main.plot(range(len(data)), ma_series, color=color, linewidth=2, 
+            ax_main.plot(x_values, ma_series, color=color, linewidth=2, 
                         label=ma_name, alpha=0.8)
         
         ax_main.set_title(f'{title_prefix}{name} - K线图+移动平均线', fontsize=16, fontweight='bold')
@@ -240,12 +344,11 @@ class MultiTimeFrameAnalyzer:
         signal_line = macd_indicators['Signal'] 
         histogram = macd_indicators['Histogram']
         
-        ax_macd.plot(range(len(data)), macd_line, color='red', linewidth=2, label='MACD')
-        ax_macd.plot(range(len(data)), signal_line, color='blue', linewidth=2, label='Signal')
+        ax_macd.plot(x_values, macd_line, color='red', linewidth=2, label='MACD')
+        ax_macd.plot(x_values, signal_line, color='blue', linewidth=2, label='Signal')
         
         # 绘制柱状图
-        colors_hist = ['red' if x > 0 else 'green' for x in histogram]
-        ax_macd.bar(range(len(data)), histogram, color=colors_hist, alpha=0.6, width=0.8)
+        self._plot_histogram_bars(ax_macd, x_values, histogram)
         
         ax_macd.axhline(y=0, color='black', linestyle='-', linewidth=1, alpha=0.8)
         ax_macd.set_title(f'{name} - MACD指标', fontsize=14, fontweight='bold')
@@ -262,7 +365,7 @@ class MultiTimeFrameAnalyzer:
             n_ticks = min(8, len(data))
             if n_ticks > 0:
                 tick_indices = np.linspace(0, len(data)-1, n_ticks, dtype=int)
-                tick_labels = [data.index[i].strftime('%Y-%m-%d') for i in tick_indices]
+                tick_labels = data.index[tick_indices].strftime('%Y-%m-%d').tolist()
                 
                 ax.set_xticks(tick_indices)
                 ax.set_xticklabels(tick_labels, rotation=45, fontsize=10)
@@ -270,8 +373,7 @@ class MultiTimeFrameAnalyzer:
         plt.tight_layout()
         
         if save_path:
-            ensure_directory_exists(os.path.dirname(save_path))
-            fig.savefig(save_path, bbox_inches='tight', dpi=300)
+            save_figure(fig, save_path, self.draft, self.auto_close)
         
         return fig, (ax_main, ax_macd)
     
@@ -337,6 +439,7 @@ class MultiTimeFrameAnalyzer:
         
         timeframes = ['daily', 'weekly', 'monthly']
         timeframe_names = ['日线', '周线', '月线']
+        colors = ['blue', 'orange', 'red', 'green', 'purple']
         
         axes = []
         
@@ -354,11 +457,12 @@ class MultiTimeFrameAnalyzer:
             # 绘制K线
             self._plot_candlesticks(ax_main, data)
             
-            # 绘制移动平均线
-            colors = ['blue', 'orange', 'red', 'green', 'purple']
-            for j, (ma_name, ma_series) in enumerate(ma_indicators.items()):
-                color = colors[j % len(colors)]
-                ax_main.plot(data.index, ma_series, color=color, linewidth=1.5, 
+            # 均线和MACD与K线使用相同的整数横坐标
+            x_values = np.arange(len(data))
+            
+            # 绘制移动平均线（各周期共用同一组颜色）
+            for (ma_name, ma_series), color in zip(ma_indicators.items(), itertools.cycle(colors)):
+                ax_main.plot(x_values, ma_series, color=color, linewidth=1.5, 
                            label=ma_name, alpha=0.8)
             
             ax_main.set_title(f'{name} - K线图+移动平均线', fontsize=14, fontweight='bold')
@@ -374,12 +478,11 @@ class MultiTimeFrameAnalyzer:
             histogram = macd_indicators['Histogram']
             
             # 绘制MACD
-            ax_macd.plot(data.index, macd_line, color='red', linewidth=1.5, label='MACD')
-            ax_macd.plot(data.index, signal_line, color='blue', linewidth=1.5, label='Signal')
+            ax_macd.plot(x_values, macd_line, color='red', linewidth=1.5, label='MACD')
+            ax_macd.plot(x_values, signal_line, color='blue', linewidth=1.5, label='Signal')
             
             # 绘制柱状图
-            colors_hist = ['red' if x > 0 else 'green' for x in histogram]
-            ax_macd.bar(data.index, histogram, color=colors_hist, alpha=0.6, width=1)
+            self._plot_histogram_bars(ax_macd, x_values, histogram)
             
             ax_macd.axhline(y=0, color='black', linestyle='-', linewidth=0.8, alpha=0.8)
             ax_macd.set_title(f'{name} - MACD', fontsize=14, fontweight='bold')
@@ -387,16 +490,53 @@ class MultiTimeFrameAnalyzer:
             ax_macd.legend(loc='upper left', fontsize=10)
             ax_macd.grid(True, alpha=0.3)
             
+            # x轴标签（子图较窄，只显示少量日期）
+            ax_macd.set_xlim(-0.5, len(data)-0.5)
+            n_ticks = min(4, len(data))
+            if n_ticks > 0:
+                tick_indices = np.linspace(0, len(data)-1, n_ticks, dtype=int)
+                ax_macd.set_xticks(tick_indices)
+                ax_macd.set_xticklabels(data.index[tick_indices].strftime('%Y-%m').tolist(),
+                                        rotation=45, fontsize=10)
+            
             axes.append((ax_main, ax_macd))
         
         plt.suptitle(title, fontsize=16, fontweight='bold')
         
         if save_path:
-            ensure_directory_exists(os.path.dirname(save_path))
-            fig.savefig(save_path, bbox_inches='tight', dpi=300)
+            save_figure(fig, save_path, self.draft, self.auto_close)
         
         return fig, axes
     
+    def _plot_histogram_bars(self, ax, x_values, histogram, width=0.8, alpha=0.6):
+        """
+        在指定坐标轴上绘制MACD柱状图（全部柱子合并为一个多边形集合）
+        
+        Parameters:
+        ax: matplotlib.axes.Axes - 坐标轴对象
+        x_values: ndarray - 各柱的横坐标
+        histogram: Series - MACD柱状图序列
+        width: float - 柱宽
+        alpha: float - 透明度
+        """
+        values = histogram.to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        heights = values[valid]
+        x = np.asarray(x_values, dtype=np.float64)[valid]
+        
+        left = x - width / 2
+        right = x + width / 2
+        zeros = np.zeros_like(heights)
+        bars = np.stack([
+            np.column_stack([left, zeros]),
+            np.column_stack([left, heights]),
+            np.column_stack([right, heights]),
+            np.column_stack([right, zeros])
+        ], axis=1)
+        colors = np.where(heights > 0, CHART_STYLE['up_color'], CHART_STYLE['down_color'])
+        ax.add_collection(PolyCollection(bars, facecolors=colors, edgecolors='none', alpha=alpha))
+        ax.autoscale_view()
+    
     def _plot_candlesticks(self, ax, data):
         """
         在指定坐标轴上绘制K线
@@ -405,30 +545,34 @@ class MultiTimeFrameAnalyzer:
         ax: matplotlib.axes.Axes - 坐标轴对象
         data: DataFrame - OHLCV数据
         """
-        for i, (date, row) in enumerate(data.iterrows()):
-            open_price = row['Open']
-            high_price = row['High']
-            low_price = row['Low']
-            close_price = row['Close']
-            
-            # 确定颜色
-            color = CHART_STYLE['up_color'] if close_price >= open_price else CHART_STYLE['down_color']
-            
-            # 绘制影线
-            ax.plot([i, i], [low_price, high_price], color='black', linewidth=1)
-            
-            # 绘制实体
-            height = abs(close_price - open_price)
-            bottom = min(open_price, close_price)
-            
-            if close_price >= open_price:  # 上涨
-                rect = Rectangle((i-0.3, bottom), 0.6, height, 
-                               facecolor=color, edgecolor='black', linewidth=0.5)
-            else:  # 下跌
-                rect = Rectangle((i-0.3, bottom), 0.6, height, 
-                               facecolor='white', edgecolor=color, linewidth=0.5)
-            
-            ax.add_patch(rect)
+        open_price = data['Open'].to_numpy(dtype=np.float64)
+        high_price = data['High'].to_numpy(dtype=np.float64)
+        low_price = data['Low'].to_numpy(dtype=np.float64)
+        close_price = data['Close'].to_numpy(dtype=np.float64)
+        x = np.arange(len(data), dtype=np.float64)
+        up = close_price >= open_price
+        
+        # 绘制影线（全部K线合并为一个线段集合）
+        wicks = np.stack([np.column_stack([x, low_price]), np.column_stack([x, high_price])], axis=1)
+        ax.add_collection(LineCollection(wicks, colors='black', linewidths=1,
+                                         capstyle='projecting', zorder=2))
+        
+        # 绘制实体：上涨为实心（黑边），下跌为空心（边框为下跌色）
+        bottom = np.minimum(open_price, close_price)
+        top = np.maximum(open_price, close_price)
+        left = x - 0.3
+        right = x + 0.3
+        bodies = np.stack([
+            np.column_stack([left, bottom]),
+            np.column_stack([left, top]),
+            np.column_stack([right, top]),
+            np.column_stack([right, bottom])
+        ], axis=1)
+        facecolors = np.where(up[:, None], to_rgba(CHART_STYLE['up_color']), to_rgba('white'))
+        edgecolors = np.where(up[:, None], to_rgba('black'), to_rgba(CHART_STYLE['down_color']))
+        ax.add_collection(PolyCollection(bodies, facecolors=facecolors, edgecolors=edgecolors,
+                                         linewidths=0.5, zorder=1))
+        ax.autoscale_view()
         
         # 设置x轴
         ax.set_xlim(-0.5, len(data)-0.5)
@@ -436,7 +580,7 @@ class MultiTimeFrameAnalyzer:
         # 设置x轴标签（简化显示）
         n_ticks = min(10, len(data))
         tick_indices = np.linspace(0, len(data)-1, n_ticks, dtype=int)
-        tick_labels = [data.index[i].strftime('%Y-%m-%d') for i in tick_indices]
+        tick_labels = data.index[tick_indices].strftime('%Y-%m-%d').tolist()
         
         ax.set_xticks(tick_indices)
         ax.set_xticklabels(tick_labels, rotation=45, fontsize=10)
@@ -504,8 +648,7 @@ class MultiTimeFrameAnalyzer:
         ax.axis('off')
         
         if save_path:
-            ensure_directory_exists(os.path.dirname(save_path))
-            fig.savefig(save_path, bbox_inches='tight', dpi=300)
+            save_figure(fig, save_path, self.draft, self.auto_close)
         
         return fig, ax
 
@@ -534,19 +677,21 @@ def analyze_multi_timeframe(daily_data, save_charts=True):
     trend_analysis = analyzer.analyze_multi_timeframe_trend(timeframe_data, ma_data)
     
     if save_charts:
-        # 保存对比图表
+        # 保存对比图表（图表只用于保存，保存后立即关闭释放内存）
         chart_path = os.path.join(PATHS['charts'], 'multi_timeframe_comparison.png')
-        analyzer.plot_multi_timeframe_comparison(
+        fig, _ = analyzer.plot_multi_timeframe_comparison(
             timeframe_data, ma_data, macd_data, 
             save_path=chart_path
         )
+        plt.close(fig)
         
         # 保存趋势对比表
         table_path = os.path.join(PATHS['charts'], 'trend_comparison_table.png')
-        analyzer.plot_trend_comparison_table(
+        fig, _ = analyzer.plot_trend_comparison_table(
             trend_analysis,
             save_path=table_path
         )
+        plt.close(fig)
     
     return analyzer, {'timeframe_data': timeframe_data, 'ma_data': ma_data, 'macd_data': macd_data}, trend_analysis
 
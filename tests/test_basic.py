@@ -148,6 +148,276 @@ def test_project_structure():
     return True
 
 
+def _make_test_ohlcv(n=600, seed=42):
+    """生成固定随机种子的模拟日线OHLCV数据"""
+    import numpy as np
+    import pandas as pd
+    
+    rng = np.random.default_rng(seed)
+    close = np.abs(10 + np.cumsum(rng.normal(0, 0.2, n))) + 1
+    return pd.DataFrame({
+        'Open': close + rng.normal(0, 0.1, n),
+        'High': close + rng.uniform(0, 0.3, n),
+        'Low': close - rng.uniform(0, 0.3, n),
+        'Close': close,
+        'Volume': rng.uniform(1e5, 1e6, n)
+    }, index=pd.bdate_range('2020-01-01', periods=n))
+
+
+def _max_abs_diff(actual, expected):
+    """比较两个序列：缺失值位置必须相同，返回其余位置的最大绝对误差"""
+    import numpy as np
+    
+    actual = np.asarray(actual, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    if actual.shape != expected.shape or not np.array_equal(np.isnan(actual), np.isnan(expected)):
+        return np.inf
+    valid = ~np.isnan(expected)
+    return float(np.max(np.abs(actual[valid] - expected[valid]))) if valid.any() else 0.0
+
+
+def _max_ulp_diff(actual, expected):
+    """比较两个序列：缺失值位置必须相同，返回其余位置以ulp（末位单位）计的最大误差"""
+    import numpy as np
+    
+    actual = np.asarray(actual, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    if actual.shape != expected.shape or not np.array_equal(np.isnan(actual), np.isnan(expected)):
+        return np.inf
+    valid = ~np.isnan(expected)
+    if not valid.any():
+        return 0.0
+    return float(np.max(np.abs(actual[valid] - expected[valid]) / np.spacing(np.abs(expected[valid]))))
+
+
+def _check(name, diff, tolerance, failed, unit=None):
+    """打印单项比较结果，超出容差时记录到failed；unit为'ulp'时误差按末位单位显示"""
+    if unit == 'ulp':
+        diff_text, tolerance_text = f"{diff:.0f} ulp", f"{tolerance} ulp"
+    else:
+        diff_text, tolerance_text = f"{diff:.1e}", f"{tolerance:.0e}"
+    if diff <= tolerance:
+        print(f"✅ {name} (最大误差 {diff_text})")
+    else:
+        print(f"❌ {name} - 最大误差 {diff_text} 超出容差 {tolerance_text}")
+        failed.append(name)
+
+
+def test_numeric_equivalence():
+    """测试加速实现与参考实现的数值一致性"""
+    print("\n🔍 测试数值一致性...")
+    
+    import sys
+    sys.path.append('src')
+    
+    import numpy as np
+    import pandas as pd
+    import talib as tb
+    from utils.kernels import stoch_kdj, all_sma, all_ema, bbands, rsi, ewm_mean, rolling_mean_std
+    from utils.helpers import resample_ohlcv
+    
+    data = _make_test_ohlcv()
+    high, low, close = data['High'].values, data['Low'].values, data['Close'].values
+    close_series = pd.Series(close)
+    failed = []
+    
+    # 指标内核与TA-Lib对比：SMA/EMA/STOCH运算顺序相同，应逐位一致
+    k, d, _ = stoch_kdj(high, low, close, 9, 3, 3)
+    talib_k, talib_d = tb.STOCH(high, low, close, fastk_period=9, slowk_period=3,
+                                slowk_matype=0, slowd_period=3, slowd_matype=0)
+    _check("stoch_kdj vs tb.STOCH", max(_max_abs_diff(k, talib_k), _max_abs_diff(d, talib_d)), 0, failed)
+    
+    periods = np.array([5, 10, 20, 60], dtype=np.int64)
+    sma_matrix = all_sma(close, periods)
+    ema_matrix = all_ema(close, periods)
+    _check("all_sma vs tb.SMA", max(_max_abs_diff(sma_matrix[j], tb.SMA(close, timeperiod=int(p)))
+                                    for j, p in enumerate(periods)), 0, failed)
+    # EMA递推中乘加是否融合（FMA）取决于编译器和CPU，与TA-Lib只要求在几个ulp之内
+    _check("all_ema vs tb.EMA", max(_max_ulp_diff(ema_matrix[j], tb.EMA(close, timeperiod=int(p)))
+                                    for j, p in enumerate(periods)), 2, failed, unit='ulp')
+    
+    # 布林带和RSI的求和顺序与TA-Lib不同，允许浮点误差
+    upper, middle, lower, _, _ = bbands(close, 20, 2.0)
+    talib_bands = tb.BBANDS(close, timeperiod=20, nbdevup=2, nbdevdn=2, matype=0)
+    _check("bbands vs tb.BBANDS", max(_max_abs_diff(a, b) for a, b in zip((upper, middle, lower), talib_bands)),
+           1e-9, failed)
+    _check("rsi vs tb.RSI", _max_abs_diff(rsi(close, 14), tb.RSI(close, timeperiod=14)), 1e-12, failed)
+    
+    # 内核与pandas对比
+    _check("ewm_mean vs Series.ewm(adjust=False)",
+           _max_abs_diff(ewm_mean(close, 2.0 / 13), close_series.ewm(span=12, adjust=False).mean()), 0, failed)
+    rolling_mean, rolling_std = rolling_mean_std(close, 20)
+    _check("rolling_mean_std vs rolling().mean()/std()",
+           max(_max_abs_diff(rolling_mean, close_series.rolling(20).mean()),
+               _max_abs_diff(rolling_std, close_series.rolling(20).std())), 0, failed)
+    
+    # 周线/月线聚合与resample对比（索引和各列都应完全一致）
+    for rule, name in (('W', '周线'), ('M', '月线')):
+        actual = resample_ohlcv(data, rule)
+        expected = data.resample('ME' if rule == 'M' else rule).agg({
+            'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'
+        }).dropna()
+        diff = max(_max_abs_diff(actual[c], expected[c]) for c in expected.columns) \
+            if actual.index.equals(expected.index) else np.inf
+        _check(f"resample_ohlcv vs resample().agg() ({name})", diff, 0, failed)
+    
+    assert not failed, f"数值不一致: {', '.join(failed)}"
+    return True
+
+
+def test_incremental_update():
+    """测试逐根K线增量更新与全量重新计算的一致性"""
+    print("\n🔍 测试增量更新...")
+    
+    import sys
+    sys.path.append('src')
+    
+    from indicators.ma_system import MovingAverageSystem
+    from indicators.macd import MACDIndicator
+    from visualization.multi_timeframe import MultiTimeFrameAnalyzer
+    from utils.helpers import resample_ohlcv
+    
+    data = _make_test_ohlcv()
+    start = 400
+    failed = []
+    
+    # 前start根K线全量计算，其余逐根update，最后与全量计算结果对比
+    ma_system = MovingAverageSystem(data.iloc[:start])
+    ma_system.calculate_all_ma()
+    macd = MACDIndicator(data.iloc[:start])
+    macd.calculate_macd()
+    for i in range(start, len(data)):
+        ma_system.update(data.iloc[i])
+        macd.update(data.iloc[i])
+    
+    full_ma = MovingAverageSystem(data)
+    full_ma.calculate_all_ma()
+    full_macd = MACDIndicator(data)
+    full_macd.calculate_macd()
+    
+    # SMA递推时窗口和的累加顺序与全量计算不同，允许浮点误差
+    _check("MovingAverageSystem.update vs calculate_all_ma",
+           _max_abs_diff(ma_system.ma_matrix, full_ma.ma_matrix)
+           if ma_system.data.index.equals(data.index) and ma_system.ma_names == full_ma.ma_names else float('inf'),
+           1e-12, failed)
+    _check("MACDIndicator.update vs calculate_macd",
+           max(_max_abs_diff(macd.macd_data[key], full_macd.macd_data[key]) for key in full_macd.macd_data),
+           1e-12, failed)
+    
+    # 同一日期再次update视为修正最后一根K线（连续修正两次），结果应与修正后数据的全量计算一致
+    revised = data.copy()
+    bar = revised.iloc[-1].copy()
+    for factor in (1.05, 0.9):
+        bar['Close'] *= factor
+        ma_system.update(bar)
+        macd.update(bar)
+    revised.iloc[-1] = bar
+    full_ma = MovingAverageSystem(revised)
+    full_ma.calculate_all_ma()
+    full_macd = MACDIndicator(revised)
+    full_macd.calculate_macd()
+    _check("MovingAverageSystem.update 修正最后一根K线",
+           _max_abs_diff(ma_system.ma_matrix, full_ma.ma_matrix)
+           if ma_system.data.index.equals(data.index) else float('inf'), 1e-12, failed)
+    _check("MACDIndicator.update 修正最后一根K线",
+           max(_max_abs_diff(macd.macd_data[key], full_macd.macd_data[key]) for key in full_macd.macd_data)
+           if macd.data.index.equals(data.index) else float('inf'), 1e-12, failed)
+    
+    # 早于最后一根K线的日期应报错，且对象状态保持不变
+    for name, indicator in (("MovingAverageSystem", ma_system), ("MACDIndicator", macd)):
+        try:
+            indicator.update(data.iloc[-5])
+            rejected = False
+        except ValueError:
+            rejected = len(indicator.close) == len(indicator.data) == len(data)
+        if rejected:
+            print(f"✅ {name}.update 拒绝早于最后一根K线的日期")
+        else:
+            print(f"❌ {name}.update 未拒绝早于最后一根K线的日期或状态被修改")
+            failed.append(f"{name}.update 日期检查")
+    
+    # 多周期MACD：日线逐根追加；周线按所属周的标签更新，未走完的周线被逐日修正
+    for timeframe, rule in (('daily', None), ('weekly', 'W')):
+        base = data.iloc[:start] if rule is None else resample_ohlcv(data.iloc[:start], rule)
+        full = data if rule is None else resample_ohlcv(data, rule)
+        
+        analyzer = MultiTimeFrameAnalyzer()
+        analyzer.calculate_multi_timeframe_macd({timeframe: base})
+        for date, close in data['Close'].iloc[start:].items():
+            label = date if rule is None else date.to_period(rule).to_timestamp(how='end').normalize()
+            series = analyzer.update_macd(timeframe, label, close)
+        expected = MultiTimeFrameAnalyzer().calculate_multi_timeframe_macd({timeframe: full})[timeframe]
+        
+        diff = max(_max_abs_diff(series[key], expected[key]) for key in expected) \
+            if series['MACD'].index.equals(expected['MACD'].index) else float('inf')
+        _check(f"update_macd vs calculate_multi_timeframe_macd ({timeframe})", diff, 0, failed)
+    
+    assert not failed, f"增量更新结果不一致: {', '.join(failed)}"
+    return True
+
+
+def test_report_cache():
+    """测试统计报告缓存：输入变化时缓存键随之变化，相同输入的第二次调用命中缓存"""
+    print("\n🔍 测试报告缓存...")
+    
+    import sys
+    sys.path.append('src')
+    
+    import os
+    import pickle
+    import tempfile
+    import numpy as np
+    from utils.config import PATHS
+    from analysis.statistics import QuantitativeStatistics
+    
+    data = _make_test_ohlcv()
+    # 指标中包含大数组：repr会截断，只改中间一个元素时也必须得到不同的键
+    indicators = {'values': np.arange(5000, dtype=np.float64)}
+    changed_indicators = {'values': indicators['values'].copy()}
+    changed_indicators['values'][2500] = -1.0
+    changed_data = data.copy()
+    changed_data.iloc[300, changed_data.columns.get_loc('Close')] += 0.01
+    failed = []
+    
+    key = QuantitativeStatistics(data)._get_report_cache_key(indicators, None)
+    for name, key_data, key_indicators in (("行情数据变化", changed_data, indicators),
+                                           ("大数组中间元素变化", data, changed_indicators)):
+        if QuantitativeStatistics(key_data)._get_report_cache_key(key_indicators, None) != key:
+            print(f"✅ {name}时缓存键不同")
+        else:
+            print(f"❌ {name}时缓存键相同")
+            failed.append(name)
+    
+    # 缓存目录指向临时目录，测试结束后恢复
+    cache_dir = PATHS['cache']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        PATHS['cache'] = tmp_dir
+        try:
+            QuantitativeStatistics(data).generate_performance_report()
+            cache_files = os.listdir(tmp_dir)
+            
+            # 在缓存文件中写入标记，第二次调用返回带标记的报告即说明读取了缓存
+            if len(cache_files) == 1:
+                cache_path = os.path.join(tmp_dir, cache_files[0])
+                with open(cache_path, 'rb') as f:
+                    cached = pickle.load(f)
+                cached['cache_marker'] = True
+                with open(cache_path, 'wb') as f:
+                    pickle.dump(cached, f)
+            report = QuantitativeStatistics(data).generate_performance_report()
+        finally:
+            PATHS['cache'] = cache_dir
+    
+    if len(cache_files) == 1 and report.get('cache_marker'):
+        print("✅ 相同输入的第二次调用命中缓存")
+    else:
+        print("❌ 相同输入的第二次调用未命中缓存")
+        failed.append("缓存命中")
+    
+    assert not failed, f"报告缓存异常: {', '.join(failed)}"
+    return True
+
+
 def main():
     """主测试函数"""
     print("=" * 60)
@@ -163,6 +433,13 @@ def main():
     # 测试导入
     imports_ok = test_imports()
     
+    # 测试数值一致性、增量更新和报告缓存
+    try:
+        numeric_ok = test_numeric_equivalence() and test_incremental_update() and test_report_cache()
+    except AssertionError as e:
+        print(f"❌ {str(e)}")
+        numeric_ok = False
+    
     # 测试Tushare连接
     tushare_ok = test_tushare_connection()
     
@@ -170,7 +447,7 @@ def main():
     print("📋 测试结果总结")
     print("=" * 60)
     
-    if deps_ok and imports_ok and tushare_ok:
+    if deps_ok and imports_ok and numeric_ok and tushare_ok:
         print("🎉 所有测试通过！项目可以正常运行。")
         print("\n▶️  运行主程序: python main.py")
         print("▶️  运行示例: python example.py")
@@ -181,6 +458,9 @@ def main():
         if not deps_ok:
             print("📦 请先安装依赖包: pip install -r requirements.txt")
         
+        if not numeric_ok:
+            print("🔢 加速实现与参考实现的计算结果不一致，请检查以上误差信息")
+        
         if not tushare_ok:
             print("🔑 请配置Tushare API Token到 Tushare/key.txt 文件")
         